@@ -0,0 +1,9 @@
+"""
+Scan benchmarks for JellyFresh.
+
+Generate a synthetic library, then time scans against it, from the repository root:
+
+    python -m benchmarks.generate /tmp/jf-bench --items 10000
+    python -m benchmarks.run /tmp/jf-bench --output results.json
+    python -m benchmarks.run /tmp/jf-bench --compare results.json
+"""
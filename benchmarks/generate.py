@@ -0,0 +1,193 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+from datetime import datetime, timedelta
+
+# Share of items that are movies, the rest are episodes
+MOVIE_SHARE = 0.5
+SEASONS_PER_SHOW = 3
+EPISODES_PER_SEASON = 10
+
+# Backdate everything so directory snapshots are trusted on the first warm scan
+BACKDATE_SECONDS = 24 * 3600
+
+GENRES = ('Drama', 'Comedy', 'Action', 'Thriller', 'Documentary', 'Animation')
+WORDS = ('lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit', 'sed', 'do',
+         'eiusmod', 'tempor', 'incididunt', 'ut', 'labore', 'et', 'dolore', 'magna', 'aliqua')
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _actors(rng, count):
+    return ''.join(
+        f"  <actor>\n    <name>{_text(rng, 2).title()}</name>\n    <role>{_text(rng, 2).title()}</role>\n"
+        f"    <type>Actor</type>\n    <sortorder>{i}</sortorder>\n  </actor>\n"
+        for i in range(count)
+    )
+
+
+def movie_nfo(rng, title, release_date):
+    """Return a movie NFO laid out like Jellyfin's, a few KB with the date after the plot."""
+    return (
+        '<?xml version="1.0" encoding="utf-8" standalone="yes"?>\n<movie>\n'
+        f"  <plot><![CDATA[{_text(rng, rng.randint(60, 200))}]]></plot>\n"
+        "  <lockdata>false</lockdata>\n"
+        f"  <dateadded>{release_date} 12:00:00</dateadded>\n"
+        f"  <title>{title}</title>\n"
+        f"  <rating>{rng.uniform(1, 10):.1f}</rating>\n"
+        f"  <year>{release_date[:4]}</year>\n"
+        f"  <genre>{rng.choice(GENRES)}</genre>\n"
+        f"  <premiered>{release_date}</premiered>\n"
+        f"  <releasedate>{release_date}</releasedate>\n"
+        f"  <runtime>{rng.randint(80, 180)}</runtime>\n"
+        f"{_actors(rng, rng.randint(5, 25))}"
+        "</movie>\n"
+    )
+
+
+def episode_nfo(rng, title, aired_date):
+    return (
+        '<?xml version="1.0" encoding="utf-8" standalone="yes"?>\n<episodedetails>\n'
+        f"  <plot><![CDATA[{_text(rng, rng.randint(20, 80))}]]></plot>\n"
+        "  <lockdata>false</lockdata>\n"
+        f"  <title>{title}</title>\n"
+        f"  <aired>{aired_date}</aired>\n"
+        f"{_actors(rng, rng.randint(1, 6))}"
+        "</episodedetails>\n"
+    )
+
+
+def options_xml(media_path):
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n<LibraryOptions>\n  <PathInfos>\n    <MediaPathInfo>\n'
+        f"      <Path>{media_path}</Path>\n    </MediaPathInfo>\n  </PathInfos>\n</LibraryOptions>\n"
+    )
+
+
+def _write(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def _random_date(rng, now, max_age_days):
+    return (now - timedelta(days=rng.randint(0, max_age_days))).strftime('%Y-%m-%d')
+
+
+def _nfo_content(rng, content, malformed, missing):
+    """Return the NFO to write, damaged or None for a share of items."""
+    roll = rng.random()
+    if roll < missing:
+        return None
+    if roll < missing + malformed:
+        return content[:len(content) // 2] if rng.random() < 0.5 else content + 'https://www.imdb.com/title/tt0000000/\n'
+    return content
+
+
+def generate_library(base, items=1000, malformed=0.02, missing=0.05, max_age_days=730, seed=0):
+    """
+    Write a synthetic Jellyfin library: movie folders, shows with seasons, and their options.xml.
+
+    Args:
+        base (str): Folder to create the library in, emptied first if it holds a previous library.
+        items (int): Number of videos, split between movies and episodes.
+        malformed (float): Share of NFOs that are truncated or followed by junk.
+        missing (float): Share of videos without an NFO.
+        max_age_days (int): Release and air dates are spread over this many days.
+        seed (int): Random seed, the same seed gives the same library.
+
+    Returns:
+        dict: The layout, also saved as library.json: paths and item counts.
+    """
+    rng = random.Random(seed)
+    now = datetime.now()
+    movies_path = os.path.join(base, 'media', 'Movies')
+    shows_path = os.path.join(base, 'media', 'Shows')
+    config_path = os.path.join(base, 'config', 'root', 'default')
+    spotlight = {name: os.path.join(base, 'spotlight', name) for name in ('movies', 'shows')}
+
+    movie_count = int(items * MOVIE_SHARE)
+    episodes_per_show = SEASONS_PER_SHOW * EPISODES_PER_SEASON
+    show_count = max(1, (items - movie_count) // episodes_per_show)
+
+    if os.path.exists(os.path.join(base, 'library.json')):
+        for folder in ('media', 'spotlight', 'config', 'state'):
+            shutil.rmtree(os.path.join(base, folder), ignore_errors=True)
+    for path in [movies_path, shows_path, *spotlight.values()]:
+        os.makedirs(path, exist_ok=True)
+
+    for i in range(movie_count):
+        title = f"Movie {i:06d}"
+        folder = os.path.join(movies_path, f"{title} ({2000 + i % 25})")
+        os.makedirs(folder, exist_ok=True)
+        _write(os.path.join(folder, f"{title}.mkv"), '')
+        nfo = _nfo_content(rng, movie_nfo(rng, title, _random_date(rng, now, max_age_days)), malformed, missing)
+        if nfo is not None:
+            _write(os.path.join(folder, f"{title}.nfo"), nfo)
+
+    for s in range(show_count):
+        show = os.path.join(shows_path, f"Show {s:05d}")
+        os.makedirs(show, exist_ok=True)
+        _write(os.path.join(show, 'tvshow.nfo'), f"<tvshow>\n  <title>Show {s:05d}</title>\n</tvshow>\n")
+        for season in range(1, SEASONS_PER_SHOW + 1):
+            season_path = os.path.join(show, f"Season {season:02d}")
+            os.makedirs(season_path, exist_ok=True)
+            _write(os.path.join(season_path, 'season.nfo'), f"<season>\n  <seasonnumber>{season}</seasonnumber>\n</season>\n")
+            for episode in range(1, EPISODES_PER_SEASON + 1):
+                name = f"S{season:02d}E{episode:02d}"
+                _write(os.path.join(season_path, f"{name}.mkv"), '')
+                content = episode_nfo(rng, f"Episode {episode}", _random_date(rng, now, max_age_days))
+                nfo = _nfo_content(rng, content, malformed, missing)
+                if nfo is not None:
+                    _write(os.path.join(season_path, f"{name}.nfo"), nfo)
+
+    for subfolder, media_path in (('Movies', movies_path), ('Shows', shows_path)):
+        os.makedirs(os.path.join(config_path, subfolder), exist_ok=True)
+        _write(os.path.join(config_path, subfolder, 'options.xml'), options_xml(media_path))
+
+    backdated = time.time() - BACKDATE_SECONDS
+    for root in (movies_path, shows_path):
+        for dirpath, _, filenames in os.walk(root, topdown=False):
+            for name in filenames:
+                os.utime(os.path.join(dirpath, name), (backdated, backdated))
+            os.utime(dirpath, (backdated, backdated))
+
+    layout = {
+        "items": items,
+        "movies": movie_count,
+        "shows": show_count,
+        "episodes": show_count * episodes_per_show,
+        "malformed": malformed,
+        "missing": missing,
+        "seed": seed,
+        "movies_path": movies_path,
+        "shows_path": shows_path,
+        "config_path": config_path,
+        "spotlight": spotlight
+    }
+    _write(os.path.join(base, 'library.json'), json.dumps(layout, indent=4))
+    return layout
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic media library for scan benchmarks.")
+    parser.add_argument('base', help="Folder to create the library in")
+    parser.add_argument('--items', type=int, default=1000, help="Number of videos (default: 1000)")
+    parser.add_argument('--malformed', type=float, default=0.02, help="Share of malformed NFOs (default: 0.02)")
+    parser.add_argument('--missing', type=float, default=0.05, help="Share of videos without NFO (default: 0.05)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    started = time.monotonic()
+    layout = generate_library(args.base, args.items, args.malformed, args.missing, seed=args.seed)
+    print(f"Generated {layout['movies']} movies and {layout['episodes']} episodes in {args.base} "
+          f"({time.monotonic() - started:.1f}s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+import os
+import time
+import builtins
+from contextlib import contextmanager
+
+# Filesystem calls that cost a round-trip on a network mount
+PATCHED_CALLS = ('scandir', 'listdir', 'stat', 'lstat', 'mkdir', 'rmdir', 'remove', 'unlink', 'symlink', 'readlink')
+
+
+@contextmanager
+def filesystem_latency(roots, seconds):
+    """
+    Add a delay to every filesystem call under some folders, like a CIFS or NFS mount would.
+
+    The os functions and open() are patched for the duration of the block. The
+    delay is a sleep, so calls issued from several threads overlap like real
+    network round-trips. DirEntry.stat() results cached by scandir are not delayed.
+
+    Args:
+        roots (list): Folders to slow down, e.g., the generated media and spotlight folders.
+        seconds (float): Delay added to each call.
+    """
+    roots = tuple(os.path.join(os.path.realpath(root), '') for root in roots)
+    originals = {name: getattr(os, name) for name in PATCHED_CALLS}
+    original_open = builtins.open
+
+    def slow(call):
+        def wrapper(path, *args, **kwargs):
+            if isinstance(path, (str, os.PathLike)) and os.path.join(os.fspath(path), '').startswith(roots):
+                time.sleep(seconds)
+            return call(path, *args, **kwargs)
+        return wrapper
+
+    for name, call in originals.items():
+        setattr(os, name, slow(call))
+    builtins.open = slow(original_open)
+    try:
+        yield
+    finally:
+        for name, call in originals.items():
+            setattr(os, name, call)
+        builtins.open = original_open
@@ -0,0 +1,238 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import argparse
+import resource
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+from scan_engine import run_scan  # noqa: E402
+from utils import get_jellyfin_media_paths, extract_nfo_tags  # noqa: E402
+from benchmarks.latency import filesystem_latency  # noqa: E402
+from contextlib import nullcontext  # noqa: E402
+
+# Scenarios in the order they run, each one starts from the state the previous left
+SCENARIOS = {
+    "full": "Empty index and spotlight folders: parse every NFO and create every link",
+    "warm": "NFO index populated, directory snapshot off: list every folder, parse nothing",
+    "no_change": "NFO index and directory snapshot populated: nothing changed since the last scan",
+    "rebuild": "Warm index, link_mode rebuild: wipe and relink the spotlight folders",
+    "parse": "Parse every NFO with extract_nfo_tags, no index"
+}
+TIME_PERIOD = 90 * 24 * 3600  # Spotlight window in seconds
+REGRESSION_THRESHOLD = 1.2  # A scenario this much slower than the baseline is reported as a regression
+
+
+def load_layout(base):
+    with open(os.path.join(base, 'library.json'), 'r') as f:
+        return json.load(f)
+
+
+def build_libraries(layout):
+    """Return the library entries JellyFresh would store for the generated library."""
+    media_paths = get_jellyfin_media_paths(layout['config_path'])
+    libraries = []
+    for category in ('movies', 'shows'):
+        for media_path in media_paths[category]:
+            libraries.append({
+                'media_type': category,
+                'time_period': TIME_PERIOD,
+                'media_path': media_path,
+                'new_releases_folder': layout['spotlight'][category]
+            })
+    return libraries
+
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_scenario(base, scenario, scan_options, latency_ms=0):
+    """
+    Run one scenario in this process and return its measurements.
+
+    Args:
+        base (str): Folder holding the generated library.
+        scenario (str): One of SCENARIOS.
+        scan_options (dict): The "scan" configuration section to benchmark with.
+        latency_ms (float): Delay added to every filesystem call on the media and
+            spotlight folders, to simulate a network mount.
+
+    Returns:
+        dict: Wall time, peak RSS, filesystem calls and parse rate.
+    """
+    layout = load_layout(base)
+    if latency_ms:
+        roots = [layout['movies_path'], layout['shows_path'], *layout['spotlight'].values()]
+        latency = filesystem_latency(roots, latency_ms / 1000)
+    else:
+        latency = nullcontext()
+    with latency:
+        return _run_scenario(base, layout, scenario, scan_options)
+
+
+def _run_scenario(base, layout, scenario, scan_options):
+    libraries = build_libraries(layout)
+    index_file = os.path.join(base, 'state', 'metadata_index.db')
+
+    if scenario == 'parse':
+        tags = ('title', 'releasedate', 'aired')
+        parsed = 0
+        started = time.perf_counter()
+        for root in (layout['movies_path'], layout['shows_path']):
+            for dirpath, _, filenames in os.walk(root):
+                for name in filenames:
+                    if name.endswith('.nfo'):
+                        extract_nfo_tags(os.path.join(dirpath, name), tags)
+                        parsed += 1
+        wall = time.perf_counter() - started
+        return {
+            "scenario": scenario,
+            "wall_seconds": round(wall, 4),
+            "peak_rss_kb": peak_rss_kb(),
+            "nfo_parsed": parsed,
+            "parsed_per_second": round(parsed / wall, 1) if wall else None
+        }
+
+    options = dict(scan_options)
+    link_mode = 'reconcile'
+    if scenario == 'full':
+        shutil.rmtree(os.path.dirname(index_file), ignore_errors=True)
+        for folder in layout['spotlight'].values():
+            shutil.rmtree(folder, ignore_errors=True)
+            os.makedirs(folder)
+    elif scenario == 'warm':
+        options['directory_snapshot'] = False
+    elif scenario == 'rebuild':
+        link_mode = 'rebuild'
+
+    started = time.perf_counter()
+    scan = run_scan(libraries, index_file=index_file, scan_options=options, link_mode=link_mode)
+    wall = time.perf_counter() - started
+
+    parsed = scan['fs_ops'].get('open', 0)
+    return {
+        "scenario": scenario,
+        "wall_seconds": round(wall, 4),
+        "peak_rss_kb": peak_rss_kb(),
+        "fs_ops": scan['fs_ops'],
+        "index": scan['index'],
+        "nfo_parsed": parsed,
+        "parsed_per_second": round(parsed / wall, 1) if wall and parsed else 0.0,
+        "linked": len(scan['movies']) + len(scan['shows']),
+        "changes": scan['changes']
+    }
+
+
+def git_version():
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'], cwd=REPO_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_all(base, scenarios, scan_options, latency_ms=0):
+    """Run each scenario in a fresh interpreter, so peak RSS is measured per scenario."""
+    results = []
+    for scenario in scenarios:
+        completed = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.run', base, '--single', scenario,
+             '--scan-options', json.dumps(scan_options), '--latency-ms', str(latency_ms)],
+            cwd=REPO_DIR, capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"Scenario {scenario} failed:\n{completed.stderr}")
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print(f"{scenario:>10}: {result['wall_seconds']:.3f}s, {result['peak_rss_kb'] // 1024} MB peak, "
+              f"{result['nfo_parsed']} NFOs parsed", file=sys.stderr)
+
+    return {
+        "version": git_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "library": {key: value for key, value in load_layout(base).items() if key in (
+            'items', 'movies', 'shows', 'episodes', 'malformed', 'missing', 'seed')},
+        "scan_options": scan_options,
+        "latency_ms": latency_ms,
+        "results": results
+    }
+
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """
+    Print the change of every scenario against a baseline run.
+
+    Returns:
+        bool: True if any scenario got slower than threshold times the baseline.
+    """
+    baseline_results = {result['scenario']: result for result in baseline['results']}
+    regressed = False
+    print(f"{'scenario':>10}  {'baseline':>9}  {'current':>9}  {'ratio':>6}  rss ratio")
+    for result in current['results']:
+        before = baseline_results.get(result['scenario'])
+        if before is None:
+            continue
+        ratio = result['wall_seconds'] / before['wall_seconds'] if before['wall_seconds'] else float('inf')
+        rss_ratio = result['peak_rss_kb'] / before['peak_rss_kb'] if before['peak_rss_kb'] else float('inf')
+        flag = '  REGRESSION' if ratio > threshold else ''
+        regressed = regressed or bool(flag)
+        print(f"{result['scenario']:>10}  {before['wall_seconds']:>8.3f}s  {result['wall_seconds']:>8.3f}s  "
+              f"{ratio:>6.2f}  {rss_ratio:>9.2f}{flag}")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time JellyFresh scans against a generated library.")
+    parser.add_argument('base', help="Folder created by benchmarks.generate")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"Comma-separated scenarios to run (default: {','.join(SCENARIOS)})")
+    parser.add_argument('--scan-options', default='{}', help="JSON \"scan\" configuration section to use")
+    parser.add_argument('--latency-ms', type=float, default=0,
+                        help="Delay added to every filesystem call, to simulate a network mount (default: 0)")
+    parser.add_argument('--output', help="Write the results as JSON to this file (default: stdout)")
+    parser.add_argument('--compare', metavar='BASELINE', help="Compare with an earlier --output file")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help=f"Slowdown ratio reported as a regression (default: {REGRESSION_THRESHOLD})")
+    parser.add_argument('--single', choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    # Per-item log lines would dominate the timings
+    logging.basicConfig(level=logging.CRITICAL)
+    scan_options = json.loads(args.scan_options)
+
+    if args.single:
+        print(json.dumps(run_scenario(args.base, args.single, scan_options, args.latency_ms)))
+        return 0
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+
+    report = run_all(args.base, scenarios, scan_options, args.latency_ms)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+    elif not args.compare:
+        print(json.dumps(report, indent=4))
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        return 1 if compare(baseline, report, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,30 +1,99 @@
 import json
 import os
+import copy
+import threading
+from utils import file_lock
+
+# Parsed configurations by path, with the (inode, mtime, size) they were read at
+_cache = {}
+_cache_lock = threading.Lock()
+
+def _file_key(st):
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
 
 def load_config(config_file):
     """
     Load the configuration file.
-    
+
+    The parsed configuration is cached per process and only read again when the
+    file's inode, mtime or size changes, so repeated calls cost a stat.
+
     Args:
         config_file (str): Path to the configuration file.
-        
+
     Returns:
-        dict: Loaded configuration.
+        dict: Loaded configuration, a copy the caller is free to modify.
     """
-    if not os.path.exists(config_file):
+    try:
+        st = os.stat(config_file)
+    except FileNotFoundError:
         return {"libraries": []}
 
-    with open(config_file, 'r') as f:
-        return json.load(f)
+    with _cache_lock:
+        cached = _cache.get(config_file)
+        if cached is None or cached[0] != _file_key(st):
+            with open(config_file, 'r') as f:
+                st = os.fstat(f.fileno())
+                cached = (_file_key(st), json.load(f))
+            _cache[config_file] = cached
+        return copy.deepcopy(cached[1])
 
 
-def save_config(config_file, config_data):
+def config_version(config_file):
     """
-    Save the configuration file.
-    
+    Return a string that changes whenever the configuration file does, e.g., for ETags.
+
     Args:
         config_file (str): Path to the configuration file.
-        config_data (dict): Configuration data to save.
+
+    Returns:
+        str: The file's inode, mtime and size, or None if there is no file yet.
+    """
+    try:
+        st = os.stat(config_file)
+    except FileNotFoundError:
+        return None
+    return "-".join(f"{value:x}" for value in _file_key(st))
+
+
+def _write_config(config_file, config_data):
+    """Write the configuration through a temporary file and rename, the caller holds the lock."""
+    tmp_file = f"{config_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_file, 'w') as f:
+            json.dump(config_data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, config_file)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+    # Make the rename itself durable
+    dir_fd = os.open(os.path.dirname(os.path.abspath(config_file)), os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def update_config(config_file, update):
+    """
+    Change part of the configuration, keeping whatever other workers saved meanwhile.
+
+    The file is read and written under the same inter-process lock, so a change
+    made from a configuration loaded earlier can't revert newer edits.
+
+    Args:
+        config_file (str): Path to the configuration file.
+        update (callable): Called with the current configuration dict, changes it in place.
+
+    Returns:
+        dict: The saved configuration.
     """
-    with open(config_file, 'w') as f:
-        json.dump(config_data, f, indent=4)
+    with file_lock(f"{config_file}.lock"):
+        config_data = load_config(config_file)
+        update(config_data)
+        _write_config(config_file, config_data)
+    return config_data
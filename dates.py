@@ -0,0 +1,79 @@
+from datetime import datetime
+from functools import lru_cache
+
+# NFO tags tried in order for an item's date, the first one holding a valid date wins
+DEFAULT_DATE_TAGS = {
+    "movies": ("releasedate", "premiered", "year"),
+    "shows": ("aired", "premiered", "year")
+}
+
+# Libraries repeat the same few thousand dates, parsed ones are remembered
+DATE_CACHE_SIZE = 8192
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_date(value):
+    """
+    Parse an NFO date: YYYY-MM-DD, optionally followed by a time, or a bare year.
+
+    Args:
+        value (str): The tag's text, e.g., '2024-05-17', '2024-05-17 20:00:00' or '2024'.
+
+    Returns:
+        datetime: Midnight of that day, January 1st for a bare year.
+
+    Raises:
+        ValueError: If the value isn't a date.
+    """
+    value = value.strip()
+    if len(value) == 4 and value.isdigit():
+        return datetime(int(value), 1, 1)
+    if len(value) >= 10 and value[4] == '-' and value[7] == '-' and value[:4].isdigit():
+        # The time part of timestamps like 2024-05-17T20:00:00Z is ignored
+        if len(value) > 10 and value[10] not in 'T ':
+            raise ValueError(f"Invalid date: {value!r}")
+        return datetime(int(value[:4]), int(value[5:7]), int(value[8:10]))
+    return datetime.strptime(value, '%Y-%m-%d')  # Raises ValueError with the usual message
+
+
+def date_tags(media_type, options=None):
+    """
+    Return the NFO tags tried for a media type's dates.
+
+    Args:
+        media_type (str): 'movies' or 'shows'.
+        options (dict, optional): Media type -> list of tags, from the "date_tags" scan option.
+
+    Returns:
+        tuple: Tag names, most trusted first.
+    """
+    tags = (options or {}).get(media_type)
+    return tuple(tags) if tags else DEFAULT_DATE_TAGS[media_type]
+
+
+def resolve_date(values, tags):
+    """
+    Return the date of the first tag in the chain that holds a valid one.
+
+    Args:
+        values (dict): Tag name to text, as read from the NFO or metadata backend.
+        tags (iterable): Tags to try in order, see date_tags.
+
+    Returns:
+        datetime: The resolved date, or None if none of the tags is set.
+
+    Raises:
+        ValueError: If tags are set but none of them holds a valid date.
+    """
+    invalid = None
+    for tag in tags:
+        value = values.get(tag)
+        if not value:
+            continue
+        try:
+            return parse_date(value)
+        except ValueError:
+            invalid = invalid or f"<{tag}>{value}</{tag}>"
+    if invalid:
+        raise ValueError(f"Invalid date {invalid}")
+    return None
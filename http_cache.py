@@ -0,0 +1,147 @@
+import os
+import gzip
+import zlib
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+# Static assets requested through static_url never change under the same URL
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+# Bodies worth compressing, smaller ones gain less than the gzip header costs
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript', 'text/javascript',
+    'text/plain', 'text/html', 'text/css', 'image/svg+xml'
+}
+
+# Content hashes of static files by path, with the mtime they were computed at
+_hashes = {}
+_hashes_lock = threading.Lock()
+
+
+def static_url(static_folder, filename):
+    """
+    Return a URL for a static file that changes whenever the file's content does.
+
+    The hash is computed once per file modification, so rendering a page costs a stat.
+
+    Args:
+        static_folder (str): The app's static folder.
+        filename (str): File name relative to the static folder, e.g., 'scripts.js'.
+
+    Returns:
+        str: /static/<filename>?v=<content hash>, or the plain URL if the file can't be read.
+    """
+    path = os.path.join(static_folder, filename)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return f"/static/{filename}"
+
+    with _hashes_lock:
+        cached = _hashes.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            cached = (mtime, hashlib.sha256(f.read()).hexdigest()[:12])
+        with _hashes_lock:
+            _hashes[path] = cached
+    return f"/static/{filename}?v={cached[1]}"
+
+
+def file_validators(path):
+    """
+    Return an ETag and Last-Modified date describing a file's current version.
+
+    Args:
+        path (str): File to describe, e.g., the configuration file or a log file.
+
+    Returns:
+        tuple: (etag, last modified datetime), or (None, None) if the file doesn't exist.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None, None
+    etag = f"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"
+    return etag, datetime.fromtimestamp(st.st_mtime, timezone.utc)
+
+
+def conditional(response, request, etag, last_modified=None):
+    """
+    Add validators to a response and turn it into a 304 if the client's copy is current.
+
+    Args:
+        response (Response): The full response.
+        request (Request): The request, for its If-None-Match and If-Modified-Since headers.
+        etag (str): Version of the response's content, None to leave the response alone.
+        last_modified (datetime, optional): When that content last changed.
+
+    Returns:
+        Response: The response, possibly turned into a 304 Not Modified.
+    """
+    if etag is None:
+        return response
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Clients revalidate on every use, an unchanged body costs a 304
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def _gzip_stream(chunks):
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def compress_response(response, request):
+    """
+    Gzip a response body when the client accepts it and it's worth it.
+
+    Complete bodies are compressed at once if they reach GZIP_MIN_BYTES.
+    Streamed ones, e.g., NDJSON results or static files, are compressed as
+    they're sent. Event streams are left alone so every event arrives as soon
+    as it's written.
+
+    Args:
+        response (Response): The response about to be sent.
+        request (Request): The request, for its Accept-Encoding header.
+
+    Returns:
+        Response: The response, compressed or not.
+    """
+    if (response.status_code != 200
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or 'Content-Encoding' in response.headers
+            or 'gzip' not in request.accept_encodings):
+        return response
+
+    if response.is_streamed or response.direct_passthrough:
+        response.direct_passthrough = False
+        response.response = _gzip_stream(response.response)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < GZIP_MIN_BYTES:
+            return response
+        response.set_data(gzip.compress(data, GZIP_LEVEL))
+
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    # The validators describe the uncompressed content, only weakly this body
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
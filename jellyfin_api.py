@@ -0,0 +1,138 @@
+import os
+import logging
+import requests
+
+DEFAULT_TIMEOUT = 10  # Seconds per request, a slow Jellyfin never holds up a scan for long
+
+# Refresh what's on disk without touching metadata or images Jellyfin already has
+REFRESH_PARAMS = {
+    "Recursive": "true",
+    "MetadataRefreshMode": "Default",
+    "ImageRefreshMode": "Default",
+    "ReplaceAllMetadata": "false",
+    "ReplaceAllImages": "false"
+}
+
+
+class JellyfinClient:
+    """
+    Minimal client for the Jellyfin endpoints JellyFresh needs.
+
+    Args:
+        url (str): Jellyfin server URL, e.g., http://localhost:8096
+        api_key (str): API key created under Dashboard > API Keys.
+        timeout (float, optional): Seconds to wait for each response.
+    """
+
+    def __init__(self, url, api_key, timeout=DEFAULT_TIMEOUT):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f'MediaBrowser Client="JellyFresh", Token="{api_key}"'
+
+    def _request(self, method, path, **kwargs):
+        response = self.session.request(method, self.url + path, timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def virtual_folders(self):
+        """Return Jellyfin's libraries, each a dict with its Name, ItemId and Locations."""
+        return self._request('GET', '/Library/VirtualFolders').json()
+
+    def refresh_item(self, item_id):
+        """Queue a recursive refresh of one item, e.g., a library, and return immediately."""
+        self._request('POST', f'/Items/{item_id}/Refresh', params=REFRESH_PARAMS)
+
+    def close(self):
+        self.session.close()
+
+
+def _contains(parent, path):
+    return path == parent or path.startswith(os.path.join(parent, ''))
+
+
+def library_for_folder(virtual_folders, folder):
+    """
+    Return the Jellyfin library that shows a spotlight folder.
+
+    A library whose location is the folder itself wins, then the one with the
+    longest location containing it, e.g., over a library of a shared parent
+    folder, then one with a location inside the folder.
+
+    Args:
+        virtual_folders (list): Libraries returned by JellyfinClient.virtual_folders.
+        folder (str): Spotlight folder.
+
+    Returns:
+        dict: The best matching library, or None.
+    """
+    folder = os.path.normpath(folder)
+    best, best_rank = None, None
+    for library in virtual_folders:
+        for location in library.get('Locations') or []:
+            location = os.path.normpath(location)
+            if _contains(location, folder):
+                rank = (1, len(location))  # An exact match is the longest location containing the folder
+            elif _contains(folder, location):
+                rank = (0, -len(location))
+            else:
+                continue
+            if best_rank is None or rank > best_rank:
+                best, best_rank = library, rank
+    return best
+
+
+def refresh_changed_libraries(options, changes):
+    """
+    Ask Jellyfin to refresh the libraries of the spotlight folders whose links changed.
+
+    Folders without added or removed links are skipped, and a library shown by
+    several changed folders is refreshed once. Errors are logged, never raised,
+    Jellyfin's own scheduled scan still picks the changes up.
+
+    Args:
+        options (dict): The 'jellyfin' configuration, with 'url', 'api_key' and optionally 'timeout'.
+        changes (dict): Spotlight folder -> {'added': n, 'removed': n}.
+
+    Returns:
+        dict: Spotlight folder -> 'refreshed', 'unchanged', 'not_found' or 'failed'.
+            Empty when no Jellyfin URL and API key are configured.
+    """
+    if not options.get('url') or not options.get('api_key'):
+        return {}
+
+    status = {folder: 'unchanged' for folder, counts in changes.items() if not counts['added'] and not counts['removed']}
+    changed = [folder for folder in changes if folder not in status]
+    if not changed:
+        logging.debug("No spotlight folder changed, skipping the Jellyfin refresh")
+        return status
+
+    client = JellyfinClient(options['url'], options['api_key'], float(options.get('timeout', DEFAULT_TIMEOUT)))
+    try:
+        try:
+            virtual_folders = client.virtual_folders()
+        except (requests.RequestException, ValueError) as e:
+            logging.error(f"Unable to list Jellyfin libraries at {client.url}: {e}")
+            return dict(status, **{folder: 'failed' for folder in changed})
+
+        refreshed = {}  # Library ItemId -> result, so a shared library is refreshed once
+        for folder in changed:
+            library = library_for_folder(virtual_folders, folder)
+            if library is None:
+                logging.warning(f"No Jellyfin library shows {folder}, add it as a library to see its links")
+                status[folder] = 'not_found'
+                continue
+
+            item_id = library['ItemId']
+            if item_id not in refreshed:
+                try:
+                    client.refresh_item(item_id)
+                    refreshed[item_id] = 'refreshed'
+                    logging.info(f"Refreshing Jellyfin library {library.get('Name')}")
+                except requests.RequestException as e:
+                    refreshed[item_id] = 'failed'
+                    logging.error(f"Unable to refresh Jellyfin library {library.get('Name')}: {e}")
+            status[folder] = refreshed[item_id]
+    finally:
+        client.close()
+    return status
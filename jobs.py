@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import uuid
+import fcntl
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+FINISHED_STATES = ('completed', 'failed')
+KEEP_FINISHED_JOBS = 20  # Finished job records kept on disk
+PROGRESS_INTERVAL = 0.5  # Seconds between progress writes
+
+
+def job_key(libraries, dry_run=False):
+    """Return a stable key for a scan request, so identical submissions can be merged."""
+    payload = json.dumps({"libraries": libraries, "dry_run": dry_run}, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def process_start(pid):
+    """
+    Return when a process started, so a recycled PID isn't mistaken for it.
+
+    Args:
+        pid (int): Process id.
+
+    Returns:
+        int: Start time in clock ticks since boot, or None without /proc or if the process is gone.
+    """
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # The command name in parentheses may hold spaces, the fields after it don't
+    return int(stat.rsplit(')', 1)[1].split()[19])
+
+
+class Job:
+    """
+    A background scan and its progress.
+
+    The record is written to the jobs folder as JSON, so any gunicorn worker can
+    answer status requests for a job running in another worker.
+    """
+
+    def __init__(self, manager, job_id, key):
+        self.manager = manager
+        self.record = {
+            "id": job_id,
+            "key": key,
+            "pid": os.getpid(),
+            "pid_started": process_start(os.getpid()),
+            "state": "queued",
+            "phase": "queued",
+            "items_scanned": 0,
+            "items_linked": 0,
+            "submitted_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "elapsed": 0.0,
+            "result": None,
+            "error": None
+        }
+        self._started = None
+        self._last_write = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def id(self):
+        return self.record['id']
+
+    def update(self, force=False, **fields):
+        """
+        Update progress fields (phase, items_scanned, items_linked, ...).
+
+        Writes are throttled to one every PROGRESS_INTERVAL seconds unless forced.
+        """
+        with self._lock:
+            self.record.update(fields)
+            if self._started is not None:
+                self.record['elapsed'] = round(time.monotonic() - self._started, 2)
+            now = time.monotonic()
+            if force or now - self._last_write >= PROGRESS_INTERVAL:
+                self._last_write = now
+                self.manager.write(self.record)
+
+    def run(self, target):
+        """Run the scan function and record its result or error."""
+        self._started = time.monotonic()
+        self.update(force=True, state='running', phase='starting', started_at=datetime.now().isoformat())
+        try:
+            result = target(self)
+        except Exception as e:
+            logging.error(f"Scan job {self.id} failed: {e}")
+            self.update(force=True, state='failed', phase='failed', error=str(e),
+                        finished_at=datetime.now().isoformat())
+        else:
+            self.update(force=True, state='completed', phase='done', result=result,
+                        finished_at=datetime.now().isoformat())
+        finally:
+            self.manager.finish(self)
+
+
+class JobManager:
+    """Runs scans as background threads and persists their status records."""
+
+    def __init__(self, jobs_dir):
+        """
+        Args:
+            jobs_dir (str): Folder holding one JSON record per job, e.g., /opt/jellyfresh/jobs
+        """
+        self.jobs_dir = jobs_dir
+        self._active = {}  # key -> Job running in this process
+        self._lock = threading.Lock()
+
+    def _path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def write(self, record):
+        """Atomically write a job record."""
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        path = self._path(record['id'])
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+
+    def get(self, job_id):
+        """
+        Return a job record, whichever process runs the job.
+
+        Args:
+            job_id (str): The job id returned by submit().
+
+        Returns:
+            dict: The job record, or None if it doesn't exist.
+        """
+        if not job_id or not all(c in '0123456789abcdef' for c in job_id):
+            return None
+        try:
+            with open(self._path(job_id), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _is_live(self, record):
+        """Return whether the process that wrote an unfinished record still runs its job."""
+        pid = record.get('pid')
+        if pid == os.getpid():
+            return False  # Jobs of this process are in _active, this one was left by a previous run
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        except (TypeError, OverflowError):
+            return False
+        # After a restart, e.g., docker restart, workers get the same small PIDs again
+        started = process_start(pid)
+        if started is None:
+            return not os.path.isdir('/proc/self')  # Without /proc, a live PID is all there is to go by
+        return started == record.get('pid_started')
+
+    def _find_running(self, key):
+        """
+        Return the id of an unfinished job with this key in any live process.
+
+        Unfinished records whose process is gone are marked failed on the way.
+        """
+        job = self._active.get(key)
+        if job is not None:
+            return job.id
+
+        try:
+            names = os.listdir(self.jobs_dir)
+        except OSError:
+            return None
+        running_id = None
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            record = self.get(name[:-5])
+            if not record or record['state'] in FINISHED_STATES:
+                continue
+            if not self._is_live(record):
+                logging.warning(f"Scan job {record['id']} was left behind by a stopped worker, marking it failed")
+                record.update(state='failed', phase='failed', error="The worker running this job stopped",
+                              finished_at=datetime.now().isoformat())
+                self.write(record)
+                continue
+            if record['key'] == key and running_id is None:
+                running_id = record['id']
+        return running_id
+
+    def submit(self, key, target):
+        """
+        Start a scan in the background, or join the identical scan already running.
+
+        Args:
+            key (str): Identity of the scan request, see job_key().
+            target (callable): Called with the Job, returns the JSON-serialisable result.
+
+        Returns:
+            tuple: (job id, whether the submission was merged into a running job).
+        """
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        with self._lock, open(os.path.join(self.jobs_dir, '.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)  # Serialise submissions across workers
+            running_id = self._find_running(key)
+            if running_id is not None:
+                logging.info(f"Scan request merged into running job {running_id}")
+                return running_id, True
+
+            job = Job(self, uuid.uuid4().hex, key)
+            self.write(job.record)
+            self._active[key] = job
+
+        threading.Thread(target=job.run, args=(target,), name=f"scan-job-{job.id[:8]}", daemon=True).start()
+        return job.id, False
+
+    def finish(self, job):
+        """Forget a finished job and prune old records."""
+        with self._lock:
+            if self._active.get(job.record['key']) is job:
+                del self._active[job.record['key']]
+        self._prune()
+
+    def _prune(self):
+        """Keep only the most recent finished job records."""
+        try:
+            records = [self.get(name[:-5]) for name in os.listdir(self.jobs_dir) if name.endswith('.json')]
+        except OSError:
+            return
+        finished = sorted(
+            (r for r in records if r and r['state'] in FINISHED_STATES),
+            key=lambda r: r['finished_at'] or '',
+            reverse=True
+        )
+        for record in finished[KEEP_FINISHED_JOBS:]:
+            try:
+                os.remove(self._path(record['id']))
+            except OSError:
+                pass
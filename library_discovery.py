@@ -0,0 +1,128 @@
+import os
+import logging
+import threading
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+
+# Jellyfin collection types JellyFresh can spotlight, and the media type they scan as
+CONTENT_TYPES = {"movies": "movies", "tvshows": "shows"}
+
+# Library folders classified by name, for setups without a .collection file or ContentType
+LEGACY_FOLDERS = {"Movies": "movies", "Shows": "shows"}
+
+JellyfinLibrary = namedtuple('JellyfinLibrary', 'name content_type media_type paths')
+
+# Discovered libraries by config path, with the folder and options.xml mtimes they were read at
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _signature(base_config_path):
+    """
+    Return what the discovered libraries depend on: the config folder, each library folder and its options.xml.
+
+    Adding or removing a library changes the config folder's mtime, changing a
+    library's type or paths changes its folder or options.xml mtime.
+    """
+    entries = []
+    with os.scandir(base_config_path) as it:
+        for entry in it:
+            if entry.is_dir():
+                options_file = os.path.join(entry.path, "options.xml")
+                entries.append((entry.name, entry.stat().st_mtime_ns, _mtime_ns(options_file)))
+    return _mtime_ns(base_config_path), tuple(sorted(entries))
+
+
+def _content_type(library_dir, root):
+    """Return the library's collection type: its <type>.collection file, then <ContentType> in options.xml."""
+    for name in os.listdir(library_dir):
+        if name.endswith('.collection'):
+            return name[:-len('.collection')].lower()
+    if root is not None and root.findtext('ContentType'):
+        return root.findtext('ContentType').strip().lower()
+    return None
+
+
+def _read_library(library_dir):
+    """Read one library folder, returning a JellyfinLibrary or None if it isn't movies or shows."""
+    name = os.path.basename(library_dir)
+    options_file = os.path.join(library_dir, "options.xml")
+    root = None
+    try:
+        root = ET.parse(options_file).getroot()
+    except FileNotFoundError:
+        logging.warning(f"Missing options.xml for library {name}: {options_file}")
+    except ET.ParseError as e:
+        logging.error(f"Error reading {options_file}: {e}")
+
+    content_type = _content_type(library_dir, root)
+    media_type = CONTENT_TYPES.get(content_type) if content_type else LEGACY_FOLDERS.get(name)
+    if media_type is None:
+        logging.debug("Skipping library %s with content type %s", name, content_type)
+        return None
+
+    # Extract all paths under <PathInfos>/<MediaPathInfo>/<Path>, falling back to the .mblink files
+    paths = []
+    if root is not None:
+        paths = [element.text for element in root.findall(".//PathInfos/MediaPathInfo/Path") if element.text]
+    if not paths:
+        for link_name in sorted(os.listdir(library_dir)):
+            if link_name.endswith('.mblink'):
+                with open(os.path.join(library_dir, link_name), 'r') as f:
+                    path = f.read().strip()
+                if path:
+                    paths.append(path)
+
+    for path in paths:
+        logging.info(f"Found {media_type} library {name}: {path}")
+    return JellyfinLibrary(name, content_type, media_type, tuple(paths))
+
+
+def discover_libraries(base_config_path):
+    """
+    Find every Jellyfin library that holds movies or shows, whatever its name.
+
+    The result is cached per process and only read again when a library is
+    added or removed, or a library folder or its options.xml changes, so
+    repeated scans cost a directory listing and a few stats.
+
+    Args:
+        base_config_path (str): Base path to the Jellyfin configuration, e.g., /var/lib/jellyfin/root/default/
+
+    Returns:
+        list: JellyfinLibrary tuples, sorted by library name.
+    """
+    try:
+        signature = _signature(base_config_path)
+    except OSError as e:
+        logging.error(f"Unable to list Jellyfin libraries in {base_config_path}: {e}")
+        return []
+
+    with _cache_lock:
+        cached = _cache.get(base_config_path)
+        if cached is not None and cached[0] == signature:
+            return list(cached[1])
+
+        libraries = []
+        for name, _, _ in signature[1]:
+            try:
+                library = _read_library(os.path.join(base_config_path, name))
+            except OSError as e:
+                logging.error(f"Error reading library {name}: {e}")
+                continue
+            if library is not None:
+                libraries.append(library)
+
+        for media_type in ('movies', 'shows'):
+            if not any(library.media_type == media_type for library in libraries):
+                logging.warning(f"No {media_type} library found in {base_config_path}")
+
+        _cache[base_config_path] = (signature, libraries)
+        return list(libraries)
@@ -1,11 +1,34 @@
 import logging
+import logging.handlers
 import os
+import queue
+import atexit
+import threading
 from datetime import datetime
 import glob
 
-def setup_logging(LOG_DIR):
-    """Setup logging for each scan with a timestamped log file and limit to the most recent 6 logs."""
-    
+# Log files written by setup_logging, one per scan
+LOG_PATTERN = "jellyfin_new_releases_*.log"
+
+# Installed once per process, see setup_logging
+_listener = None
+_file_handler = None
+_setup_lock = threading.Lock()
+
+def setup_logging(LOG_DIR, level=logging.INFO):
+    """
+    Setup logging for each scan with a timestamped log file and limit to the most recent 6 logs.
+
+    The first call installs a queue handler on the root logger and a background
+    listener that does the file and console writes, so scans never block on log
+    I/O. Later calls only switch the listener to the new scan's file.
+
+    Args:
+        LOG_DIR (str): Folder holding the log files.
+        level (int or str): Root log level, e.g., 'DEBUG' to include every scanned folder.
+    """
+    global _listener, _file_handler
+
     # Ensure log directory exists
     os.makedirs(LOG_DIR, exist_ok=True)
     os.chmod(LOG_DIR, 0o755)
@@ -14,22 +37,37 @@ def setup_logging(LOG_DIR):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     log_file = os.path.join(LOG_DIR, f'jellyfin_new_releases_{timestamp}.log')
 
-    # Configure the logger to write to the new log file
-    handler = logging.FileHandler(log_file)
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    handler.setFormatter(formatter)
-
-    # Initialize the root logger with the new handler
     root_logger = logging.getLogger()
-    root_logger.handlers = []  # Clear any existing handlers
-    root_logger.setLevel(logging.INFO)
-    root_logger.addHandler(handler)
+    with _setup_lock:
+        if _listener is None:
+            formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+            # Writes to the current scan's file, switched with setStream
+            _file_handler = logging.StreamHandler(open(log_file, 'a'))
+            _file_handler.setFormatter(formatter)
+
+            # Console output for real-time viewing
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(formatter)
 
-    # Console output for real-time viewing
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
+            log_queue = queue.SimpleQueue()
+            _listener = logging.handlers.QueueListener(log_queue, _file_handler, console_handler)
+            _listener.start()
+            atexit.register(_listener.stop)
 
+            root_logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+        else:
+            old_stream = _file_handler.setStream(open(log_file, 'a'))
+            if old_stream is not None:
+                old_stream.close()
+
+        if isinstance(level, str):
+            level = logging.getLevelName(level.upper())
+        valid_level = isinstance(level, int)
+        root_logger.setLevel(level if valid_level else logging.INFO)
+
+    if not valid_level:
+        logging.warning(f"Unknown log level {level}, using INFO.")
     logging.info("Logging setup complete.")
 
     # Limit to 6 most recent log files
@@ -37,6 +75,52 @@ def setup_logging(LOG_DIR):
 
 def cleanup_old_logs(LOG_DIR):
     """Delete older logs, keeping only the most recent 6."""
-    log_files = sorted(glob.glob(os.path.join(LOG_DIR, "jellyfin_new_releases_*.log")), reverse=True)
+    log_files = sorted(glob.glob(os.path.join(LOG_DIR, LOG_PATTERN)), reverse=True)
     for old_log in log_files[6:]:
-        os.remove(old_log)
\ No newline at end of file
+        os.remove(old_log)
+
+def latest_log_file(LOG_DIR):
+    """Return the path of the most recent log file, or None if there is none."""
+    log_files = sorted(glob.glob(os.path.join(LOG_DIR, LOG_PATTERN)), reverse=True)
+    return log_files[0] if log_files else None
+
+def tail_offset(log_file, tail_bytes):
+    """
+    Return the offset of the first complete line within the last bytes of a log file.
+
+    Args:
+        log_file (str): Path to the log file.
+        tail_bytes (int): How many bytes from the end of the file to start within.
+    """
+    size = os.path.getsize(log_file)
+    if size <= tail_bytes:
+        return 0
+    with open(log_file, 'rb') as f:
+        f.seek(size - tail_bytes)
+        partial_line = f.readline()
+    return size - tail_bytes + len(partial_line)
+
+def read_log_chunk(log_file, offset, max_bytes, whole_lines=True):
+    """
+    Read a log file from a byte offset without loading the rest of it.
+
+    Args:
+        log_file (str): Path to the log file.
+        offset (int): Byte offset to start reading at.
+        max_bytes (int): Most bytes to return.
+        whole_lines (bool): Stop after the last complete line, so a line still
+            being written is returned whole by the next read.
+
+    Returns:
+        tuple: (bytes read, offset to continue from).
+    """
+    with open(log_file, 'rb') as f:
+        f.seek(offset)
+        data = f.read(max_bytes)
+    if whole_lines and data:
+        end = data.rfind(b'\n') + 1
+        if end:
+            data = data[:end]
+        elif len(data) < max_bytes:
+            data = b''  # Only a partial line so far
+    return data, offset + len(data)
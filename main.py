@@ -1,25 +1,67 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template
 import os
+import json
 import logging
 from datetime import timedelta, datetime
-from logging_setup import setup_logging
-from config_handler import load_config, save_config
-from movie_processor import process_movies
-from show_processor import process_shows
-from utils import clean_new_releases_folder, get_jellyfin_media_paths
-import glob
+from logging_setup import setup_logging, latest_log_file, tail_offset, read_log_chunk, LOG_PATTERN
+from config_handler import load_config, update_config, config_version
+from scan_engine import run_scan, run_incremental_scan
+from metadata_backends import open_metadata_backend
+from jellyfin_api import refresh_changed_libraries
+from jobs import JobManager, job_key, FINISHED_STATES
+from metrics import MetricsStore
+from results import ResultStore, DEFAULT_PAGE_SIZE
+from utils import get_jellyfin_media_paths, paths_overlap, try_lock
+from watcher import LibraryWatcher
+from http_cache import static_url, file_validators, conditional, compress_response, STATIC_MAX_AGE
+from fnmatch import fnmatch
 import schedule
 import time
 from threading import Thread
-import requests
 
 # Flask app setup
 app = Flask(__name__)
 
+
+@app.context_processor
+def inject_static_url():
+    """Let templates link static files by content hash, e.g., {{ static_url('scripts.js') }}."""
+    return {"static_url": lambda filename: static_url(app.static_folder, filename)}
+
+
+@app.after_request
+def cache_and_compress(response):
+    """Cache content-hashed static files for good and gzip large bodies."""
+    if request.endpoint == 'static' and request.args.get('v'):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_MAX_AGE
+        response.cache_control.immutable = True
+    return compress_response(response, request)
+
 # Paths
 CONFIG_FILE = '/opt/jellyfresh/new_releases_config.json'
 JELLYFIN_CONFIG_PATH = '/var/lib/jellyfin/root/default/'
+JELLYFIN_DATA_PATH = '/var/lib/jellyfin/data/'
 LOG_DIR = '/var/log/jellyfresh'
+INDEX_FILE = '/opt/jellyfresh/metadata_index.db'
+JOBS_DIR = '/opt/jellyfresh/jobs'
+METRICS_FILE = '/opt/jellyfresh/metrics.json'
+RESULTS_DIR = '/opt/jellyfresh/results'
+LINK_LOCK_FILE = '/opt/jellyfresh/links.lock'
+LEADER_LOCK_FILE = '/opt/jellyfresh/leader.lock'
+
+# Seconds between progress events sent to the dashboard
+JOB_EVENTS_INTERVAL = 0.5
+
+# Seconds between attempts to become the scheduler leader
+LEADER_RETRY_INTERVAL = 30
+
+# Log viewer: bytes shown when it opens, most bytes per response, and how the follow stream polls
+LOG_TAIL_BYTES = 256 * 1024
+LOG_CHUNK_BYTES = 256 * 1024
+LOG_FOLLOW_INTERVAL = 1
+LOG_FOLLOW_IDLE = 60  # Seconds without new lines before the stream ends, freeing the worker
 
 # Define time periods
 PERIODS = {
@@ -28,12 +70,113 @@ PERIODS = {
     '1_month': timedelta(days=30),
     '2_months': timedelta(days=60),
     '6_months': timedelta(days=182),
-    '1_year': timedelta(days=365)
+    '1_year': timedelta(days=365),
+    'any': None  # No window, only with a limit on the number of items kept
 }
 
 
+def build_libraries(selections, jellyfin_media_paths):
+    """
+    Expand spotlight selections into one library entry per Jellyfin media path.
+
+    Args:
+        selections (list): (media_type, time_period seconds, new_releases_folder, limit) tuples,
+            where media_type is 'movies', 'shows' or 'both', time_period is None for no
+            window and limit the number of newest items kept, None for all.
+        jellyfin_media_paths (dict): Paths returned by get_jellyfin_media_paths. Paths that are,
+            contain or sit inside a spotlight folder are left out.
+
+    Returns:
+        list: Library entries as stored in the configuration.
+    """
+    libraries = []
+    spotlight_folders = [selection[2] for selection in selections]
+    for media_type, time_period_seconds, new_releases_folder, limit in selections:
+        for category in ('movies', 'shows'):
+            if media_type not in [category, 'both']:
+                continue
+            for media_path in jellyfin_media_paths[category]:
+                # A spotlight's own Jellyfin library must never be scanned as a source
+                if any(paths_overlap(media_path, folder) for folder in spotlight_folders):
+                    continue
+                library = {
+                    'media_type': category,
+                    'time_period': time_period_seconds,
+                    'media_path': media_path,
+                    'new_releases_folder': new_releases_folder
+                }
+                if limit:
+                    library['limit'] = limit
+                libraries.append(library)
+    return libraries
+
+
+def execute_scan(libraries, dry_run, job):
+    """Run a scan inside a background job and return the results shown by the dashboard."""
+    config = load_config(CONFIG_FILE)
+    setup_logging(LOG_DIR, config.get('log_level', 'INFO'))
+    metadata = open_metadata_backend(config.get('metadata', {}), JELLYFIN_DATA_PATH)
+
+    # Scan libraries concurrently and link the results
+    scan = run_scan(
+        libraries,
+        index_file=INDEX_FILE,
+        scan_options=config.get('scan', {}),
+        link_mode=config.get('link_mode', 'reconcile'),
+        dry_run=dry_run,
+        progress=job.update,
+        lock_file=LINK_LOCK_FILE,
+        metadata=metadata
+    )
+    linked_movies = scan['movies']
+    linked_shows = scan['shows']
+    index_stats = scan['index']
+
+    # Linked items are served page by page from /results, not kept in the job record
+    summary = results.save(job.id, linked_movies + linked_shows, dry_run)
+    app.logger.info(f"Linked {len(linked_movies)} movies and {len(linked_shows)} shows/seasons, see /results/{job.id}")
+    app.logger.info(f"Metadata index: {index_stats['hits']} hits, {index_stats['misses']} misses")
+    app.logger.info(f"Directory snapshot: {index_stats['dir_hits']} unchanged, {index_stats['dir_misses']} listed")
+    app.logger.info(f"Filesystem calls: {scan['fs_ops']}")
+    for library in scan['metrics']['libraries']:
+        app.logger.info(f"Phase seconds for {library['library']}: {library['phases']}")
+    metrics.record_scan(scan['metrics'])
+
+    # Point Jellyfin at the spotlight libraries that changed, instead of its next full scan
+    refresh = {} if dry_run else refresh_changed_libraries(config.get('jellyfin', {}), scan['changes'])
+
+    if dry_run:
+        message = "Dry run completed, no changes were made."
+    elif not linked_movies and not linked_shows:
+        message = "No new media linked."
+    else:
+        message = "Scan completed successfully."
+
+    job.update(items_linked=len(linked_movies) + len(linked_shows))
+    return {
+        "results": dict(summary, url=f"/results/{job.id}"),
+        "changes": scan['changes'],
+        "jellyfin_refresh": refresh,
+        "index": index_stats,
+        "fs_ops": scan['fs_ops'],
+        "metrics": scan['metrics'],
+        "message": message
+    }
+
+
+def start_scan(libraries, dry_run=False):
+    """
+    Submit a scan as a background job.
+
+    Returns:
+        tuple: (job id, whether it was merged into an identical scan already running).
+    """
+    key = job_key(libraries, dry_run)
+    return jobs.submit(key, lambda job: execute_scan(libraries, dry_run, job))
+
+
 def trigger_scan():
-    """Trigger the /new_releases scan."""
+    """Trigger a scheduled scan of the configured libraries."""
     app.logger.info("Triggering scheduled scan...")
     try:
         config = load_config(CONFIG_FILE)
@@ -41,26 +184,28 @@ def trigger_scan():
         if not libraries:
             app.logger.warning("No libraries defined in the configuration. Skipping scan.")
             return
-        
-        library_count = len(libraries)
-        form_data = {
-            'library_count': str(library_count)
-        }
-        
-        for i, library in enumerate(libraries, start=1):
-            form_data[f'media_type-{i}'] = library.get('media_type', 'movies')
-            time_period_seconds = library.get('time_period', PERIODS['1_week'].total_seconds())
-            for period_key, delta in PERIODS.items():
-                if delta.total_seconds() == time_period_seconds:
-                    form_data[f'period-{i}'] = period_key
-                    break
-            form_data[f'new_releases_folder-{i}'] = library.get('new_releases_folder', '')
-
-        response = requests.post("http://127.0.0.1:7007/new_releases", data=form_data)
-        if response.status_code == 200:
-            app.logger.info("Scheduled scan completed successfully.")
+
+        # Re-read Jellyfin's media paths, libraries may have been added since the last save
+        selections = []
+        for library in libraries:
+            selection = (
+                library.get('media_type', 'movies'),
+                library.get('time_period', PERIODS['1_week'].total_seconds()),
+                library.get('new_releases_folder', ''),
+                library.get('limit')
+            )
+            if selection not in selections:
+                selections.append(selection)
+        spotlight_folders = [selection[2] for selection in selections]
+        libraries = build_libraries(selections, get_jellyfin_media_paths(JELLYFIN_CONFIG_PATH, spotlight_folders))
+
+        update_config(CONFIG_FILE, lambda config: config.update(libraries=libraries))
+
+        job_id, merged = start_scan(libraries)
+        if merged:
+            app.logger.info(f"Scheduled scan merged into running job {job_id}.")
         else:
-            app.logger.error(f"Scheduled scan failed with status code: {response.status_code}. Response: {response.text}")
+            app.logger.info(f"Scheduled scan started as job {job_id}.")
     except Exception as e:
         app.logger.error(f"Error during scheduled scan: {e}")
 
@@ -69,30 +214,32 @@ def setup_automation():
     """Set up automated scanning based on the configuration."""
     config = load_config(CONFIG_FILE)
     automation = config.get("automation", {})
-    
+
+    # Clear existing jobs, also when switching back to manual
+    schedule.clear()
+
     if automation.get("mode") == "automatic":
         frequency = automation.get("frequency", "daily").lower()
         time_str = automation.get("time", "02:00")
 
-        # Clear existing jobs
-        schedule.clear()
-
         def calculate_next_scan(interval_days):
             """Helper function to schedule scans based on next_scan."""
             next_scan_key = "next_scan"
             now = datetime.now()
-            next_scan = automation.get(next_scan_key)
+            next_scan = load_config(CONFIG_FILE).get("automation", {}).get(next_scan_key)
 
             if next_scan:
                 next_scan = datetime.fromisoformat(next_scan)
                 if now < next_scan:
                     return  # Skip this run
-            
-            # Run the scan and update the next scan time
+
+            # Run the scan and update the next scan time, only that key, trigger_scan saved the libraries
             trigger_scan()
             next_scan = now + timedelta(days=interval_days)
-            automation[next_scan_key] = next_scan.isoformat()
-            save_config(CONFIG_FILE, config)
+            update_config(
+                CONFIG_FILE,
+                lambda config: config.setdefault("automation", {}).update({next_scan_key: next_scan.isoformat()})
+            )
 
         # Schedule the job
         if frequency == "daily":
@@ -105,23 +252,102 @@ def setup_automation():
         app.logger.info(f"Automation set to {frequency} at {time_str}.")
 
 
+def config_mtime():
+    """Return the configuration file's mtime, or None if it doesn't exist yet."""
+    try:
+        return os.stat(CONFIG_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+
 def run_scheduler():
-    """Run the scheduler loop in a separate thread."""
+    """
+    Run the scheduler loop in a separate thread.
+
+    Every gunicorn worker starts this thread, but only the worker holding the
+    leader lock schedules scans and watches the libraries. The others keep
+    trying, so a new leader takes over if the current one exits. The leader
+    reloads the automation settings whenever the configuration file changes,
+    whichever worker saved them.
+    """
+    global leader_lock
+    while leader_lock is None:
+        leader_lock = try_lock(LEADER_LOCK_FILE)
+        if leader_lock is None:
+            time.sleep(LEADER_RETRY_INTERVAL)
+    app.logger.info(f"Worker {os.getpid()} is running the scheduler.")
+
+    start_watcher()
+    loaded_mtime = None
     while True:
+        mtime = config_mtime()
+        if mtime != loaded_mtime:
+            loaded_mtime = mtime
+            setup_automation()
         schedule.run_pending()
         time.sleep(1)
 
 
+def run_watched_changes(libraries, units):
+    """Relink only the folders the watcher reported as changed."""
+    config = load_config(CONFIG_FILE)
+    metadata = open_metadata_backend(config.get('metadata', {}), JELLYFIN_DATA_PATH)
+    changes = run_incremental_scan(libraries, units, INDEX_FILE, LINK_LOCK_FILE, metadata, config.get('scan', {}))
+    refresh_changed_libraries(config.get('jellyfin', {}), changes)
+
+    # Folders keeping the newest N items are ranked across the whole library, rescan them fully
+    limited = [library for library in libraries
+               if library.get('limit') and (library['media_type'], library['media_path']) in units]
+    if limited:
+        folders = {library['new_releases_folder'] for library in limited}
+        job_id, _ = start_scan([library for library in libraries if library['new_releases_folder'] in folders])
+        app.logger.info(f"Watch update for {len(folders)} limited folder(s) runs as job {job_id}")
+    for folder, counts in changes.items():
+        if counts['added'] or counts['removed']:
+            app.logger.info(f"Watch update for {folder}: {counts['added']} added, {counts['removed']} removed")
+
+
+def start_watcher():
+    """Start the library watcher if enabled, from the scheduler leader."""
+    global watcher
+    watch_options = load_config(CONFIG_FILE).get("watch", {})
+    if not watch_options.get("enabled") or watcher is not None:
+        return
+
+    watcher = LibraryWatcher(
+        lambda: load_config(CONFIG_FILE).get('libraries', []),
+        run_watched_changes,
+        trigger_scan,
+        watch_options,
+        lambda: config_version(CONFIG_FILE)
+    )
+    watcher.start()
+
+
 # Threading for scheduler
 scheduler_thread = None
 
+# Held by the one worker that runs automation and the watcher
+leader_lock = None
+
+# Library watcher
+watcher = None
+
+# Background scan jobs
+jobs = JobManager(JOBS_DIR)
+
+# Cumulative scan metrics, shared by all workers through the metrics file
+metrics = MetricsStore(METRICS_FILE)
+
+# Linked items of each scan, one NDJSON file per job
+results = ResultStore(RESULTS_DIR)
+
 
 def initialize_app():
     """Initialize the app and start necessary background threads."""
     global scheduler_thread
-    setup_automation()  # Setup automation on app initialization
 
-    # Start the scheduler thread if it hasn't been started
+    # Start the scheduler thread if it hasn't been started, it reads the configuration itself
     if scheduler_thread is None or not scheduler_thread.is_alive():
         scheduler_thread = Thread(target=run_scheduler, daemon=True)
         scheduler_thread.start()
@@ -131,6 +357,12 @@ def initialize_app():
 initialize_app()
 
 
+def config_response(data):
+    """Return JSON read from the configuration, or a 304 if the client's copy is still current."""
+    _, last_modified = file_validators(CONFIG_FILE)
+    return conditional(jsonify(data), request, config_version(CONFIG_FILE), last_modified)
+
+
 @app.route('/')
 def home():
     """Render the home page with current config values."""
@@ -155,7 +387,7 @@ def scheduler():
             "time": "02:00",
             "next_scan": None
         })
-        return jsonify(scheduler)
+        return config_response(scheduler)
 
     elif request.method == 'POST':
         # Update the scheduler settings
@@ -180,16 +412,15 @@ def scheduler():
             next_scan = next_scan.replace(hour=int(time.split(":")[0]), minute=int(time.split(":")[1]), second=0)
 
         # Update the configuration
-        config["automation"] = {
+        automation = {
             "mode": mode,
             "frequency": frequency,
             "time": time,
             "next_scan": next_scan.isoformat() if next_scan else None
         }
-        save_config(CONFIG_FILE, config)
+        update_config(CONFIG_FILE, lambda config: config.update(automation=automation))
 
-        # Reinitialize automation
-        setup_automation()
+        # The scheduler leader reloads automation when it sees the configuration change
 
         return jsonify({
             "message": "Settings saved successfully",
@@ -197,46 +428,142 @@ def scheduler():
         })
 
 
+def _parse_log_cursor(cursor):
+    """Return the (log file, offset) a "<file name>:<offset>" cursor points at, or (None, None)."""
+    name, _, offset = (cursor or '').rpartition(':')
+    name = os.path.basename(name)
+    log_file = os.path.join(LOG_DIR, name)
+    if not offset.isdigit() or not fnmatch(name, LOG_PATTERN) or not os.path.isfile(log_file):
+        return None, None
+    return log_file, int(offset)
+
+
+def read_log(cursor):
+    """
+    Read the log lines written after a cursor, moving on to the newest log file once the cursor's file is read.
+
+    Args:
+        cursor (str): "<file name>:<offset>" returned by an earlier read, or None to tail the newest file.
+
+    Returns:
+        tuple: (text, next cursor, reset), reset is True when the text starts a different file.
+            None if there is no log file.
+    """
+    newest = latest_log_file(LOG_DIR)
+    if newest is None:
+        return None
+
+    log_file, offset = _parse_log_cursor(cursor)
+    reset = log_file is None
+    if reset:
+        log_file, offset = newest, tail_offset(newest, LOG_TAIL_BYTES)
+
+    data, offset = read_log_chunk(log_file, offset, LOG_CHUNK_BYTES)
+    if not data and log_file != newest:
+        # A newer scan started, follow its log from the beginning
+        log_file, reset = newest, True
+        data, offset = read_log_chunk(log_file, 0, LOG_CHUNK_BYTES)
+
+    text = data.decode('utf-8', errors='replace')
+    return text, f"{os.path.basename(log_file)}:{offset}", reset
+
+
 @app.route('/logs/recent', methods=['GET'])
 def get_recent_log():
-    """Serve the most recent log file's content."""
+    """
+    Serve the most recent log file's content.
+
+    Without arguments the end of the newest log is returned. Pass the
+    X-Log-Cursor header of a response as ?cursor= to get only the lines written
+    since. Byte ranges of the newest log can also be requested with a Range header.
+    """
     try:
-        # Find the most recent log file
-        log_files = sorted(glob.glob(os.path.join(LOG_DIR, "jellyfin_new_releases_*.log")), reverse=True)
-        if not log_files:
+        headers = {'Cache-Control': 'no-cache'}
+
+        # Multiple ranges aren't supported, those requests get the whole response like any other
+        if request.range is not None and request.range.units == 'bytes' and len(request.range.ranges) == 1:
+            log_file = latest_log_file(LOG_DIR)
+            if log_file is None:
+                return jsonify({"error": "No log files found."}), 404
+            size = os.path.getsize(log_file)
+            start, stop = request.range.ranges[0]
+            start = max(0, size + start) if start < 0 else start
+            stop = size if stop is None else min(stop, size)
+            if start >= stop:
+                headers['Content-Range'] = f"bytes */{size}"
+                return Response('', status=416, headers=headers)
+
+            data, end = read_log_chunk(log_file, start, min(stop - start, LOG_CHUNK_BYTES), whole_lines=False)
+            headers['Content-Range'] = f"bytes {start}-{end - 1}/{size}"
+            headers['X-Log-Cursor'] = f"{os.path.basename(log_file)}:{end}"
+            return Response(data, status=206, mimetype='text/plain', headers=headers)
+
+        # Nothing new is written to older logs, the newest one's version covers every cursor
+        newest = latest_log_file(LOG_DIR)
+        etag, last_modified = file_validators(newest) if newest else (None, None)
+        log = read_log(request.args.get('cursor'))
+        if log is None:
             return jsonify({"error": "No log files found."}), 404
 
-        most_recent_log = log_files[0]
-
-        # Read and return the log content
-        with open(most_recent_log, 'r') as log_file:
-            log_content = log_file.read()
-
-        return log_content, 200
+        text, cursor, reset = log
+        headers['X-Log-Cursor'] = cursor
+        headers['X-Log-Reset'] = '1' if reset else '0'
+        return conditional(Response(text, mimetype='text/plain', headers=headers), request, etag, last_modified)
 
     except Exception as e:
         app.logger.error(f"Error fetching logs: {e}")
         return jsonify({"error": "Failed to fetch logs."}), 500
 
 
+@app.route('/logs/stream', methods=['GET'])
+def follow_log():
+    """
+    Stream lines as they are written to the newest log file, as Server-Sent Events.
+
+    Each event carries the text and a reset flag, and its id is the cursor, so
+    a reconnecting browser resumes where it stopped. The stream ends with an
+    "idle" event once nothing has been logged for LOG_FOLLOW_IDLE seconds.
+    """
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('cursor')
+    if latest_log_file(LOG_DIR) is None:
+        return jsonify({"error": "No log files found."}), 404
+
+    def stream():
+        nonlocal cursor
+        idle = 0
+        while idle < LOG_FOLLOW_IDLE:
+            log = read_log(cursor)
+            if log is not None and log[0]:
+                text, cursor, reset = log
+                idle = 0
+                yield f"id: {cursor}\ndata: {json.dumps({'text': text, 'reset': reset})}\n\n"
+                continue  # More may be waiting
+            if log is not None:
+                cursor = log[1]
+            time.sleep(LOG_FOLLOW_INTERVAL)
+            idle += LOG_FOLLOW_INTERVAL
+        yield "event: idle\ndata: {}\n\n"
+
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
 @app.route('/libraries', methods=['GET'])
 def get_libraries():
     """Return the existing libraries from the configuration file."""
     config = load_config(CONFIG_FILE)
-    return jsonify(config.get('libraries', []))
+    return config_response(config.get('libraries', []))
 
 
 @app.route('/new_releases', methods=['POST'])
 def new_releases():
-    """Handle the form submission and process the libraries."""
-    config = load_config(CONFIG_FILE)
-    jellyfin_media_paths = get_jellyfin_media_paths(JELLYFIN_CONFIG_PATH)
-    setup_logging(LOG_DIR)
-    new_libraries = []  # Temporarily store the updated library list
-    linked_movies = []  # Collect movie titles
-    linked_shows = []   # Collect show titles
+    """Handle the form submission and start a background scan of the libraries."""
+    selections = []
 
     library_count = int(request.form.get('library_count', 1))
+    dry_run = request.form.get('dry_run', '').lower() in ('1', 'true', 'yes', 'on')
 
     for i in range(1, library_count + 1):
         media_type = request.form.get(f'media_type-{i}')
@@ -244,61 +571,114 @@ def new_releases():
         time_period = PERIODS.get(period_key, timedelta(days=30))
         new_releases_folder = request.form.get(f'new_releases_folder-{i}')
 
-        if not os.path.exists(new_releases_folder):
+        if not new_releases_folder or not os.path.exists(new_releases_folder):
             return jsonify({"error": f"New releases folder '{new_releases_folder}' does not exist."}), 400
+        new_releases_folder = os.path.normpath(new_releases_folder)
 
-        if media_type in ['movies', 'both']:
-            for movie_path in jellyfin_media_paths['movies']:
-                new_libraries.append({
-                    'media_type': 'movies',
-                    'time_period': time_period.total_seconds(),
-                    'media_path': movie_path,
-                    'new_releases_folder': new_releases_folder
-                })
-
-        if media_type in ['shows', 'both']:
-            for show_path in jellyfin_media_paths['shows']:
-                new_libraries.append({
-                    'media_type': 'shows',
-                    'time_period': time_period.total_seconds(),
-                    'media_path': show_path,
-                    'new_releases_folder': new_releases_folder
-                })
-
-    # Update configuration with new libraries
-    config['libraries'] = new_libraries
-    save_config(CONFIG_FILE, config)
+        try:
+            limit = int(request.form.get(f'limit-{i}') or 0) or None
+        except ValueError:
+            return jsonify({"error": "Keep newest must be a whole number."}), 400
+        if limit is not None and limit < 0:
+            return jsonify({"error": "Keep newest must be a whole number."}), 400
+        if time_period is None and limit is None:
+            return jsonify({"error": "Any time needs a number of newest items to keep."}), 400
 
-    # Process each library and collect results
-    for library in new_libraries:
-        media_type = library['media_type']
-        time_period = timedelta(seconds=library['time_period'])
-        media_path = library['media_path']
-        new_releases_folder = library['new_releases_folder']
+        time_period_seconds = time_period.total_seconds() if time_period is not None else None
+        selections.append((media_type, time_period_seconds, new_releases_folder, limit))
 
-        clean_new_releases_folder(new_releases_folder)
-        if media_type == 'movies':
-            linked = process_movies(media_path, new_releases_folder, time_period)
-            linked_movies.extend(linked)
-        elif media_type == 'shows':
-            linked = process_shows(media_path, new_releases_folder, time_period)
-            linked_shows.extend(linked)
+    jellyfin_media_paths = get_jellyfin_media_paths(JELLYFIN_CONFIG_PATH, [selection[2] for selection in selections])
+    new_libraries = build_libraries(selections, jellyfin_media_paths)
 
-    app.logger.info(f"Linked movies: {linked_movies}")
-    app.logger.info(f"Linked shows: {linked_shows}")
-
-    if not linked_movies and not linked_shows:
-        return jsonify({"results": {"movies": [], "shows": []}, "message": "No new media linked."})
+    # Update configuration with new libraries, a dry run changes nothing
+    if not dry_run:
+        update_config(CONFIG_FILE, lambda config: config.update(libraries=new_libraries))
 
+    job_id, merged = start_scan(new_libraries, dry_run)
     return jsonify({
-        "results": {
-            "movies": linked_movies,
-            "shows": linked_shows
-        },
-        "message": "Scan completed successfully."
+        "job_id": job_id,
+        "merged": merged,
+        "status_url": f"/jobs/{job_id}",
+        "events_url": f"/jobs/{job_id}/events",
+        "message": "Joined the scan already in progress." if merged else "Scan started."
+    }), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Return the status of a scan job: phase, items scanned and linked, elapsed time and result."""
+    record = jobs.get(job_id)
+    if record is None:
+        return jsonify({"error": "Job not found."}), 404
+    return jsonify(record)
+
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Stream a scan job's progress as Server-Sent Events until it finishes."""
+    if jobs.get(job_id) is None:
+        return jsonify({"error": "Job not found."}), 404
+
+    def stream():
+        last_payload = None
+        while True:
+            record = jobs.get(job_id)
+            if record is None:
+                yield "event: error\ndata: {\"error\": \"Job not found.\"}\n\n"
+                return
+            payload = json.dumps(record)
+            if payload != last_payload:
+                last_payload = payload
+                yield f"data: {payload}\n\n"
+            if record['state'] in FINISHED_STATES:
+                return
+            time.sleep(JOB_EVENTS_INTERVAL)
+
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
     })
 
 
+@app.route('/results', methods=['GET'])
+@app.route('/results/<run_id>', methods=['GET'])
+def get_results(run_id=None):
+    """
+    Return the items a scan linked, the latest scan if no job id is given.
+
+    Items come a page at a time, ?offset= and ?limit= select the page and
+    ?media_type= keeps only 'movies' or 'shows'. With ?format=ndjson, or an
+    Accept: application/x-ndjson header, every item is streamed one per line.
+    """
+    run_id = run_id or results.latest()
+    summary = results.summary(run_id)
+    if summary is None:
+        return jsonify({"error": "Results not found."}), 404
+
+    media_type = request.args.get('media_type')
+    if media_type not in (None, 'movies', 'shows'):
+        return jsonify({"error": "media_type must be 'movies' or 'shows'."}), 400
+
+    # A run's results never change, its id versions them
+    if request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson':
+        response = Response(results.iter_lines(run_id, media_type), mimetype='application/x-ndjson')
+    else:
+        try:
+            offset = int(request.args.get('offset', 0))
+            limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return jsonify({"error": "offset and limit must be integers."}), 400
+        response = jsonify(results.page(run_id, offset, limit, media_type))
+    response.vary.add('Accept')
+    return conditional(response, request, run_id)
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Expose cumulative scan metrics in the Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.errorhandler(Exception)
 def handle_exception(e):
     logging.error(f"Unhandled exception: {e}")
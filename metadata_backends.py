@@ -0,0 +1,227 @@
+import os
+import re
+import sqlite3
+import logging
+import threading
+
+# Jellyfin item types and the NFO tags their columns stand in for
+MOVIE_TYPE = 'MediaBrowser.Controller.Entities.Movies.Movie'
+SERIES_TYPE = 'MediaBrowser.Controller.Entities.TV.Series'
+SEASON_TYPE = 'MediaBrowser.Controller.Entities.TV.Season'
+EPISODE_TYPE = 'MediaBrowser.Controller.Entities.TV.Episode'
+
+# Item tables, newest schema first: jellyfin.db (10.11+), then library.db
+JELLYFIN_DATABASES = (('jellyfin.db', 'BaseItems'), ('library.db', 'TypedBaseItems'))
+
+DATE_PATTERN = re.compile(r'^(\d{4}-\d{2}-\d{2})')
+
+# Loaded databases by (path, table), with the file versions they were loaded at
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+class MetadataBackend:
+    """
+    Source of item metadata other than NFO files.
+
+    Items are looked up by the path of the video file, season folder or show
+    folder. Tags a backend doesn't know are None, and the scanner falls back to
+    the item's NFO for them.
+    """
+
+    name = 'none'
+
+    def lookup(self, path, tags):
+        """
+        Return the tag values known for an item.
+
+        Args:
+            path (str): Video file, season folder or show folder.
+            tags (iterable): The NFO tag names wanted, e.g., ('title', 'releasedate').
+
+        Returns:
+            dict: Tag name to value (None when unknown), or None if the item is unknown.
+        """
+        return None
+
+    def is_show(self, path):
+        """Return whether a folder is a TV show, for shows without a tvshow.nfo."""
+        return False
+
+    def close(self):
+        pass
+
+
+def _date(value):
+    """Return the YYYY-MM-DD part of a Jellyfin date column, or None."""
+    match = DATE_PATTERN.match(str(value)) if value else None
+    return match.group(1) if match else None
+
+
+class JellyfinDatabase(MetadataBackend):
+    """
+    Reads titles, premiere dates and season numbers from Jellyfin's own database.
+
+    The database is opened read-only and every item is loaded with one query,
+    so a scan costs a single pass over the table instead of one NFO parse per file.
+    """
+
+    name = 'jellyfin'
+
+    def __init__(self, db_path, table):
+        """
+        Args:
+            db_path (str): Path to jellyfin.db or library.db.
+            table (str): The item table, 'BaseItems' or 'TypedBaseItems'.
+
+        Raises:
+            sqlite3.Error: If the database can't be read.
+        """
+        self.db_path = db_path
+        self._items = {}
+        self._shows = set()
+
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            rows = conn.execute(
+                f"SELECT Type, Path, Name, PremiereDate, DateCreated, IndexNumber FROM {table}"
+                " WHERE Path IS NOT NULL AND Type IN (?, ?, ?, ?)",
+                (MOVIE_TYPE, SERIES_TYPE, SEASON_TYPE, EPISODE_TYPE)
+            )
+            for item_type, path, name, premiere_date, date_created, index_number in rows:
+                path = os.path.normpath(path)
+                values = {"title": name, "dateadded": _date(date_created)}
+                if item_type in (MOVIE_TYPE, EPISODE_TYPE):
+                    # Jellyfin keeps one premiere date, it answers every tag of the date chain
+                    premiered = _date(premiere_date)
+                    values["releasedate" if item_type == MOVIE_TYPE else "aired"] = premiered
+                    values["premiered"] = premiered
+                    values["year"] = premiered[:4] if premiered else None
+                elif item_type == SEASON_TYPE:
+                    values["seasonnumber"] = str(index_number) if index_number is not None else None
+                else:
+                    self._shows.add(path)
+                self._items[path] = values
+        finally:
+            conn.close()
+
+        logging.info(f"Loaded {len(self._items)} items from Jellyfin database {db_path}")
+
+    def lookup(self, path, tags):
+        values = self._items.get(path)
+        if values is None:
+            return None
+        return {tag: values.get(tag) for tag in tags}
+
+    def is_show(self, path):
+        return path in self._shows
+
+
+def item_table(db_path):
+    """
+    Return the table a Jellyfin database keeps its items in.
+
+    Args:
+        db_path (str): Path to the database, whatever its file name.
+
+    Returns:
+        str: 'BaseItems' or 'TypedBaseItems', or None if it has neither.
+
+    Raises:
+        sqlite3.Error: If the database can't be read.
+    """
+    tables = [table for _, table in JELLYFIN_DATABASES]
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        found = {name for name, in conn.execute(
+            f"SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ({', '.join('?' * len(tables))})", tables
+        )}
+    finally:
+        conn.close()
+    return next((table for table in tables if table in found), None)
+
+
+def find_jellyfin_database(data_path):
+    """
+    Find Jellyfin's item database.
+
+    Args:
+        data_path (str): Jellyfin's data folder, e.g., /var/lib/jellyfin/data
+
+    Returns:
+        tuple: (database path, item table), or None if no database was found.
+    """
+    for file_name, _ in JELLYFIN_DATABASES:
+        db_path = os.path.join(data_path, file_name)
+        if not os.path.isfile(db_path):
+            continue
+        try:
+            table = item_table(db_path)
+        except sqlite3.Error as e:
+            logging.warning(f"Unable to read {db_path}: {e}")
+            continue
+        if table:
+            return db_path, table
+    return None
+
+
+def _database_version(db_path):
+    """Return what changes when Jellyfin writes to a database: the file's and its WAL's mtime and size."""
+    version = []
+    for path in (db_path, f"{db_path}-wal"):
+        try:
+            st = os.stat(path)
+            version.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            version.append(None)
+    return tuple(version)
+
+
+def open_metadata_backend(options, data_path):
+    """
+    Open the metadata backend selected in the configuration.
+
+    A loaded database is kept per process and only loaded again once Jellyfin
+    has written to it, so frequent callers like the watcher don't reload every
+    item for a one-season change.
+
+    Args:
+        options (dict): The "metadata" configuration section, e.g., {"backend": "jellyfin"}.
+        data_path (str): Jellyfin's data folder, where its database lives.
+
+    Returns:
+        MetadataBackend: The backend, or None to read NFO files only.
+    """
+    backend = (options or {}).get('backend', 'nfo')
+    if backend == 'nfo':
+        return None
+    if backend != 'jellyfin':
+        logging.warning(f"Unknown metadata backend '{backend}', reading NFO files only.")
+        return None
+
+    database = options.get('database')
+    if database:
+        try:
+            table = item_table(database)
+        except sqlite3.Error as e:
+            logging.warning(f"Unable to read Jellyfin database {database}, reading NFO files only: {e}")
+            return None
+        found = (database, table) if table else None
+    else:
+        found = find_jellyfin_database(data_path)
+    if found is None:
+        logging.warning(f"No Jellyfin database found in {database or data_path}, reading NFO files only.")
+        return None
+
+    version = _database_version(found[0])
+    with _cache_lock:
+        cached = _cache.get(found)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        try:
+            metadata = JellyfinDatabase(*found)
+        except sqlite3.Error as e:
+            logging.warning(f"Unable to read Jellyfin database {found[0]}, reading NFO files only: {e}")
+            return None
+        _cache[found] = (version, metadata)
+        return metadata
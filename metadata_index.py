@@ -0,0 +1,232 @@
+import os
+import time
+import json
+import sqlite3
+import logging
+import threading
+from utils import extract_nfo_tags
+
+
+class MetadataIndex:
+    """
+    Persistent cache of NFO tag values and directory listings, stored in SQLite.
+
+    NFO entries are keyed by the NFO path and validated against the file's
+    st_mtime_ns and st_size, so an NFO is only parsed again when it changes.
+    Directory listings are validated against the directory's st_mtime_ns, which
+    changes whenever an entry is added, removed or renamed in it.
+
+    Writes are buffered and stored in batches, so a scan only holds SQLite's
+    write lock for the time of one batch, never while NFOs are being parsed.
+    """
+
+    COMMIT_EVERY = 500  # Buffered writes before they're stored in one short transaction
+    BUSY_TIMEOUT = 60  # Seconds to wait while another scan stores its batch
+    RACY_WINDOW_NS = 2 * 10**9  # Don't trust directory mtimes this recent, SMB has 2s granularity
+
+    def __init__(self, db_path):
+        """
+        Open (or create) the index database.
+
+        Args:
+            db_path (str): Path to the SQLite file, e.g., /opt/jellyfresh/metadata_index.db
+        """
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self.dir_hits = 0
+        self.dir_misses = 0
+        self._seen = set()
+        self._seen_dirs = set()
+        self._pending_nfo = {}  # path -> row not stored yet
+        self._pending_dirs = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=self.BUSY_TIMEOUT, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS nfo ("
+            " path TEXT PRIMARY KEY,"
+            " mtime_ns INTEGER NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " tags TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS dirs ("
+            " path TEXT PRIMARY KEY,"
+            " mtime_ns INTEGER NOT NULL,"
+            " entries TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def lookup_stat(self, nfo_path, st, tags, parse=None):
+        """
+        Return the requested tag values for an NFO, parsing it only if the cached entry is stale.
+
+        Args:
+            nfo_path (str): Path to the .nfo file.
+            st (os.stat_result): The file's current stat.
+            tags (iterable): XML tags to return.
+            parse (callable, optional): Replaces extract_nfo_tags, e.g., to parse in a worker process.
+
+        Returns:
+            tuple: (tag values dict, whether the file had to be parsed).
+        """
+        tags = tuple(tags)
+        with self._lock:
+            self._seen.add(nfo_path)
+            row = self._pending_nfo.get(nfo_path)
+            if row is not None:
+                row = row[1:]
+            else:
+                try:
+                    row = self._conn.execute(
+                        "SELECT mtime_ns, size, tags FROM nfo WHERE path = ?", (nfo_path,)
+                    ).fetchone()
+                except sqlite3.OperationalError as e:
+                    logging.warning(f"Metadata index unavailable, parsing {nfo_path}: {e}")
+
+        cached = {}
+        if row and row[0] == st.st_mtime_ns and row[1] == st.st_size:
+            cached = json.loads(row[2])
+            if all(tag in cached for tag in tags):
+                with self._lock:
+                    self.hits += 1
+                return {tag: cached[tag] for tag in tags}, False
+
+        # Stale, new, or missing some of the requested tags: parse and store
+        values = (parse or extract_nfo_tags)(nfo_path, [tag for tag in tags if tag not in cached])
+        cached.update(values)
+        with self._lock:
+            self.misses += 1
+            self._pending_nfo[nfo_path] = (nfo_path, st.st_mtime_ns, st.st_size, json.dumps(cached))
+            self._flush_if_full()
+        return {tag: cached[tag] for tag in tags}, True
+
+    def get_listing(self, dir_path, mtime_ns):
+        """
+        Return the cached listing of a directory if it hasn't changed since it was stored.
+
+        Args:
+            dir_path (str): Path to the directory.
+            mtime_ns (int): The directory's current st_mtime_ns.
+
+        Returns:
+            dict: {'dirs': {name: is_symlink}, 'files': [names]}, or None if stale or unknown.
+        """
+        with self._lock:
+            self._seen_dirs.add(dir_path)
+            row = self._pending_dirs.get(dir_path)
+            if row is not None:
+                row = row[1:]
+            else:
+                try:
+                    row = self._conn.execute(
+                        "SELECT mtime_ns, entries FROM dirs WHERE path = ?", (dir_path,)
+                    ).fetchone()
+                except sqlite3.OperationalError as e:
+                    logging.warning(f"Metadata index unavailable, listing {dir_path}: {e}")
+            if row and row[0] == mtime_ns:
+                self.dir_hits += 1
+                return json.loads(row[1])
+            self.dir_misses += 1
+            return None
+
+    def put_listing(self, dir_path, mtime_ns, entries):
+        """
+        Store the listing of a directory, unless its mtime is too recent to be trusted.
+
+        Args:
+            dir_path (str): Path to the directory.
+            mtime_ns (int): The directory's st_mtime_ns, taken before it was listed.
+            entries (dict): {'dirs': {name: is_symlink}, 'files': [names]}.
+        """
+        if time.time_ns() - mtime_ns < self.RACY_WINDOW_NS:
+            return  # Could still change within the same timestamp
+        with self._lock:
+            self._seen_dirs.add(dir_path)
+            self._pending_dirs[dir_path] = (dir_path, mtime_ns, json.dumps(entries))
+            self._flush_if_full()
+
+    def _flush_if_full(self):
+        if len(self._pending_nfo) + len(self._pending_dirs) >= self.COMMIT_EVERY:
+            try:
+                self._flush()
+            except sqlite3.OperationalError as e:
+                # Kept buffered, the next batch tries again
+                logging.warning(f"Unable to update the metadata index, retrying later: {e}")
+
+    def _flush(self):
+        """Store buffered rows in one transaction. Call with self._lock held."""
+        if not self._pending_nfo and not self._pending_dirs:
+            return
+        with self._conn:  # Rolled back on error, the rows stay buffered
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO nfo (path, mtime_ns, size, tags) VALUES (?, ?, ?, ?)",
+                self._pending_nfo.values()
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO dirs (path, mtime_ns, entries) VALUES (?, ?, ?)",
+                self._pending_dirs.values()
+            )
+        self._pending_nfo.clear()
+        self._pending_dirs.clear()
+
+    def prune(self, media_path):
+        """
+        Evict entries under a media path that were not seen during this scan.
+
+        Only call this after a full scan of the media path, otherwise entries that
+        still exist on disk will be dropped and re-parsed next time.
+
+        Args:
+            media_path (str): Root of the library that was scanned.
+
+        Returns:
+            int: Number of evicted NFO and directory entries.
+        """
+        prefix = os.path.join(media_path, '')
+        try:
+            with self._lock, self._conn:
+                rows = self._conn.execute(
+                    "SELECT path FROM nfo WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)
+                ).fetchall()
+                stale = [(path,) for (path,) in rows if path not in self._seen]
+                if stale:
+                    self._conn.executemany("DELETE FROM nfo WHERE path = ?", stale)
+
+                # Scans without the directory snapshot don't mark directories as seen
+                rows = self._conn.execute(
+                    "SELECT path FROM dirs WHERE path = ? OR substr(path, 1, ?) = ?",
+                    (media_path, len(prefix), prefix)
+                ).fetchall() if self._seen_dirs else []
+                stale_dirs = [(path,) for (path,) in rows if path not in self._seen_dirs]
+                if stale_dirs:
+                    self._conn.executemany("DELETE FROM dirs WHERE path = ?", stale_dirs)
+        except sqlite3.OperationalError as e:
+            logging.warning(f"Unable to evict stale index entries under {media_path}, trying next scan: {e}")
+            return 0
+
+        if stale or stale_dirs:
+            logging.info(f"Evicted {len(stale)} stale index entries and {len(stale_dirs)} directories under {media_path}")
+        return len(stale) + len(stale_dirs)
+
+    def stats(self):
+        """Return the hit and miss counters for this scan."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "dir_hits": self.dir_hits,
+            "dir_misses": self.dir_misses
+        }
+
+    def close(self):
+        """Store buffered writes and close the database."""
+        with self._lock:
+            try:
+                self._flush()
+            except sqlite3.OperationalError as e:
+                logging.warning(f"Unable to update the metadata index, {len(self._pending_nfo)} NFOs will be parsed again: {e}")
+            self._conn.close()
@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import logging
+from utils import file_lock
+
+# Upper bounds of the duration histogram buckets, in seconds
+DURATION_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+
+# name -> (type, help) for every metric JellyFresh exports
+METRICS = {
+    "jellyfresh_scans_total": ("counter", "Completed scans."),
+    "jellyfresh_last_scan_timestamp_seconds": ("gauge", "Unix time the last scan finished."),
+    "jellyfresh_scan_duration_seconds": ("histogram", "Wall time of a whole scan."),
+    "jellyfresh_phase_duration_seconds": ("histogram", "Time spent per scan phase, summed over worker threads."),
+    "jellyfresh_directories_visited_total": ("counter", "Directories listed or reused from the snapshot."),
+    "jellyfresh_items_scanned_total": ("counter", "Movies and seasons found."),
+    "jellyfresh_nfo_parsed_total": ("counter", "NFO files parsed, index hits excluded."),
+    "jellyfresh_nfo_parse_failures_total": ("counter", "NFO files parsed without any usable tag."),
+    "jellyfresh_date_errors_total": ("counter", "Release or aired dates that couldn't be parsed."),
+    "jellyfresh_links_created_total": ("counter", "Links created in spotlight folders."),
+    "jellyfresh_links_removed_total": ("counter", "Links and folders removed from spotlight folders."),
+}
+
+
+def _label_key(labels):
+    return json.dumps(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsStore:
+    """
+    Cumulative scan metrics, persisted as JSON so every gunicorn worker serves the same values.
+
+    Scans are merged into the file under a lock when they finish, and the
+    /metrics endpoint renders it in the Prometheus text format.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Path to the metrics file, e.g., /opt/jellyfresh/metrics.json
+        """
+        self.path = path
+
+    def load(self):
+        """Return the stored metrics, empty if the file is missing or unreadable."""
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, data):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _inc(data, name, value, **labels):
+        series = data.setdefault(name, {})
+        key = _label_key(labels)
+        series[key] = series.get(key, 0) + value
+
+    @staticmethod
+    def _set(data, name, value, **labels):
+        data.setdefault(name, {})[_label_key(labels)] = value
+
+    @staticmethod
+    def _observe(data, name, value, **labels):
+        series = data.setdefault(name, {})
+        histogram = series.setdefault(_label_key(labels), {
+            "buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0
+        })
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                histogram['buckets'][i] += 1
+        histogram['sum'] = round(histogram['sum'] + value, 6)
+        histogram['count'] += 1
+
+    def record_scan(self, scan_metrics):
+        """
+        Add a finished scan to the cumulative metrics.
+
+        Args:
+            scan_metrics (dict): The 'metrics' entry returned by run_scan.
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        try:
+            with file_lock(f"{self.path}.lock"):
+                data = self.load()
+                self._inc(data, "jellyfresh_scans_total", 1)
+                self._set(data, "jellyfresh_last_scan_timestamp_seconds", round(time.time(), 3))
+                self._observe(data, "jellyfresh_scan_duration_seconds", scan_metrics['duration_seconds'])
+
+                for library in scan_metrics['libraries']:
+                    labels = {"library": library['library'], "media_type": library['media_type']}
+                    self._inc(data, "jellyfresh_directories_visited_total", library['directories'], **labels)
+                    self._inc(data, "jellyfresh_items_scanned_total", library['items'], **labels)
+                    self._inc(data, "jellyfresh_nfo_parsed_total", library['nfo_parsed'], **labels)
+                    self._inc(data, "jellyfresh_nfo_parse_failures_total", library['parse_failures'], **labels)
+                    self._inc(data, "jellyfresh_date_errors_total", library['date_errors'], **labels)
+                    for phase, seconds in library['phases'].items():
+                        self._observe(data, "jellyfresh_phase_duration_seconds", seconds, phase=phase, **labels)
+
+                for folder in scan_metrics['folders']:
+                    labels = {"folder": folder['folder']}
+                    self._inc(data, "jellyfresh_links_created_total", folder['links_created'], **labels)
+                    self._inc(data, "jellyfresh_links_removed_total", folder['links_removed'], **labels)
+                    for phase, seconds in folder['phases'].items():
+                        self._observe(data, "jellyfresh_phase_duration_seconds", seconds, phase=phase, **labels)
+
+                self._write(data)
+        except OSError as e:
+            logging.warning(f"Unable to record scan metrics in {self.path}: {e}")
+
+    def render(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        data = self.load()
+        lines = []
+        for name, (metric_type, help_text) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for key, value in sorted(data.get(name, {}).items()):
+                labels = [tuple(pair) for pair in json.loads(key)]
+                if metric_type != 'histogram':
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                for bound, count in zip(DURATION_BUCKETS, value['buckets']):
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {value['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value['sum'])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+        return '\n'.join(lines) + '\n'
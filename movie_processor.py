@@ -1,67 +1,115 @@
 import os
 import logging
+import itertools
 from datetime import datetime
-from utils import parse_nfo
+from utils import keep_newest
+from scanner import LibraryScanner
+from dates import date_tags, resolve_date
 
-def process_movies(media_path, new_releases_folder, time_period):
+def scan_movies(media_path, targets, index=None, plans=None, scanner=None, limits=None, date_tag_options=None):
     """
-    Process movies and link recent media to the new releases folder.
+    Walk a movies library once and plan links for every spotlight folder it feeds.
 
     Args:
         media_path (str): Path to the movies library.
-        new_releases_folder (str): Path to the new releases folder.
-        time_period (timedelta): Time period to filter recent movies.
+        targets (list): (new_releases_folder, time_period) pairs to evaluate each movie against,
+            a None time_period meaning no window.
+        index (MetadataIndex, optional): Persistent NFO index to skip unchanged files.
+        plans (dict, optional): Spotlight folder -> {link path: media file}, filled in place.
+        scanner (LibraryScanner, optional): Scanner to walk with, e.g., to share its syscall counter.
+        limits (dict, optional): Spotlight folder -> number of newest movies to keep. These are
+            picked with a heap of that size, then linked newest first.
+        date_tag_options (dict, optional): Media type -> NFO tags tried for the release date, see dates.date_tags.
 
     Returns:
-        list: A list of clean movie titles that were linked.
+        dict: Spotlight folder -> list of linked movies, each a dict with the media_type,
+            clean title, release date, source video, link path and spotlight folder.
     """
-    cutoff_date = datetime.now() - time_period
-    linked_movies = [] # Clean titles of linked movies
+    now = datetime.now()
+    cutoffs = [(folder, now - time_period if time_period is not None else None) for folder, time_period in targets]
+    plans = {} if plans is None else plans
+    scanner = scanner or LibraryScanner()
+    linked_movies = {folder: [] for folder, _ in targets} # Linked movies, for the results
+    found = no_metadata = undated = 0
+    limits = {folder: limit for folder, limit in (limits or {}).items() if folder in linked_movies}
+    newest = {folder: [] for folder in limits}  # Bounded heaps of the newest movies per limited folder
+    sequence = itertools.count()  # Breaks ties between movies released the same day
 
     logging.info(f"Processing movies from: {media_path}")
-    logging.info(f"Cutoff date for new releases: {cutoff_date}")
+    for folder, cutoff_date in cutoffs:
+        logging.info(f"Cutoff date for new releases in {folder}: {cutoff_date}")
+        if folder in limits:
+            logging.info(f"Keeping the newest {limits[folder]} movies in {folder}")
 
-    for root, dirs, files in os.walk(media_path):
-        logging.info(f"Scanning folder: {root}")
-        
-        for file in files:
-            if file.lower().endswith(('.mkv', '.mp4', '.avi', '.mov', '.wmv', '.flv')):
-                video_file = os.path.join(root, file)
+    release_date_tags = date_tags('movies', date_tag_options)
+    tags = ('title',) + release_date_tags
 
-                # Check for an .nfo file with the same name
-                nfo_file = os.path.splitext(video_file)[0] + '.nfo'
+    def read_movie(candidate):
+        return candidate, scanner.read_item(candidate.video_path, candidate.nfo_path, candidate.nfo_entry, tags, index)
 
-                # If no matching NFO file, check for movie.nfo in the current folder
-                if not os.path.exists(nfo_file):
-                    nfo_file = os.path.join(root, 'movie.nfo')
+    # Metadata is read by the scanner's pool while the walk continues, results arrive in walk order
+    for candidate, nfo_tags in scanner.pipeline(scanner.iter_movies(media_path), read_movie):
+        file = candidate.file
+        found += 1
+        if nfo_tags is None:
+            no_metadata += 1
+            logging.debug("No .nfo file found for %s. Skipping.", file)
+            continue
 
-                if os.path.exists(nfo_file):
-                    movie_title = parse_nfo(nfo_file, 'title') or os.path.splitext(file)[0]
-                    release_date_str = parse_nfo(nfo_file, 'releasedate')
+        nfo_file = candidate.nfo_path or candidate.video_path
+        movie_title = nfo_tags['title'] or os.path.splitext(file)[0]
 
-                    try:
-                        release_date = datetime.strptime(release_date_str, '%Y-%m-%d') if release_date_str else None
-                        logging.info(f"Movie: {movie_title}, Release Date: {release_date}")
-                    except ValueError:
-                        logging.error(f"Invalid release date format in {nfo_file} for movie: {movie_title}")
-                        continue  # Skip this movie
+        try:
+            with scanner.timed('dates'):
+                release_date = resolve_date(nfo_tags, release_date_tags)
+            logging.debug("Movie: %s, Release Date: %s", movie_title, release_date)
+        except ValueError as e:
+            scanner.stats.add('date_errors')
+            logging.error(f"{e} in {nfo_file} for movie: {movie_title}")
+            continue  # Skip this movie
 
-                    if release_date and release_date >= cutoff_date:
-                        # Create a dedicated folder for the movie
-                        movie_folder = os.path.join(new_releases_folder, movie_title)
-                        os.makedirs(movie_folder, exist_ok=True)
+        if not release_date:
+            undated += 1
+            logging.debug("Skipping %s - No release date.", movie_title)
+            continue
 
-                        # Create symbolic link in the movie folder
-                        media_link = os.path.join(movie_folder, file)
-                        if not os.path.exists(media_link):
-                            os.symlink(video_file, media_link)
-                            logging.info(f"Linked {video_file} to {media_link}")
-                            linked_movies.append(movie_title)  # Append the clean title
-                    else:
-                        logging.info(f"Skipping {movie_title} - Release date not within range.")
-                else:
-                    logging.warning(f"No .nfo file found for {file}. Skipping.")
+        for folder, cutoff_date in cutoffs:
+            if cutoff_date is not None and release_date < cutoff_date:
+                logging.debug("Skipping %s for %s - Release date not within range.", movie_title, folder)
+                continue
 
-    logging.info(f"Total movies linked: {len(linked_movies)}")
-    return linked_movies # Return linked movies for web results
+            # Link into a dedicated folder for the movie
+            media_link = os.path.join(folder, movie_title, file)
+            movie = {
+                "media_type": "movies",
+                "title": movie_title,  # The clean title
+                "date": release_date.date().isoformat(),
+                "source": candidate.video_path,
+                "link": media_link,
+                "folder": folder
+            }
+            if folder in limits:
+                keep_newest(newest[folder], limits[folder], (release_date, movie_title, next(sequence)), movie)
+                continue
+            links = plans.setdefault(folder, {})
+            if media_link not in links:
+                links[media_link] = candidate.video_path
+                linked_movies[folder].append(movie)
 
+    # Link what stayed in the heaps, newest first
+    for folder, heap in newest.items():
+        links = plans.setdefault(folder, {})
+        for _, movie in sorted(heap, key=lambda entry: entry[0], reverse=True):
+            if movie['link'] not in links:
+                links[movie['link']] = movie['source']
+                linked_movies[folder].append(movie)
+
+    # Per-movie lines are logged at DEBUG, summarize the library at INFO
+    logging.info(f"Movies in {media_path}: {found} found, {undated} without release date")
+    if no_metadata:
+        logging.warning(f"{no_metadata} movies in {media_path} have no .nfo file and were skipped, "
+                        f"set log_level to DEBUG to list them")
+    for folder, movies in linked_movies.items():
+        logging.info(f"Movies linked to {folder}: {len(movies)}")
+    logging.info(f"Total movies linked: {sum(len(movies) for movies in linked_movies.values())}")
+    return linked_movies
@@ -0,0 +1,95 @@
+import queue
+import threading
+from collections import deque
+
+DEFAULT_PARSE_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 256  # Candidates buffered between the walker and the parsers
+
+_DONE = object()
+
+
+class _Failure:
+    """Carries an exception raised by the walker thread to the consumer."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def prefetch(iterable, maxsize=DEFAULT_QUEUE_SIZE):
+    """
+    Run an iterator in its own thread and yield its items through a bounded queue.
+
+    The thread blocks once maxsize items are waiting, so a fast walker can't
+    run ahead of its consumer on a huge library.
+
+    Args:
+        iterable (iterable): Items to produce, e.g., LibraryScanner.iter_movies().
+        maxsize (int): Items buffered before the producer waits.
+    """
+    items = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        """Queue an item unless the consumer stopped, returning whether it was queued."""
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+        except Exception as e:
+            put(_Failure(e))
+            return
+        finally:
+            # Release the walk's open directories even when the consumer gave up
+            if hasattr(iterator, 'close'):
+                iterator.close()
+        put(_DONE)
+
+    thread = threading.Thread(target=produce, name='scan-walker', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()  # Consumer gave up early, let the producer exit
+
+
+def ordered_map(pool, func, iterable, window=DEFAULT_QUEUE_SIZE):
+    """
+    Yield func(item) for every item, in input order, computed by a worker pool.
+
+    At most `window` items are in flight, which keeps memory flat and applies
+    backpressure to whatever produces the items.
+
+    Args:
+        pool (Executor): Pool running func.
+        func (callable): Called with each item.
+        iterable (iterable): The items.
+        window (int): Maximum number of submitted but unconsumed items.
+    """
+    pending = deque()
+    try:
+        for item in iterable:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # Closed early or a result raised, drop the work nobody will consume
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,224 @@
+import os
+import json
+import logging
+from array import array
+from datetime import datetime
+from itertools import islice
+
+KEEP_RUNS = 20  # Scan results kept on disk, like finished job records
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH = 1024  # Index entries read at once when streaming one media type
+
+
+class ResultStore:
+    """
+    Linked items of each scan, one NDJSON file per run.
+
+    Items are written one line at a time and read back page by page or as a
+    stream, so neither the scan job record nor a response holds the full list.
+    A small JSON summary next to each file keeps the counts per media type.
+
+    An index file holds the byte offset of every line, then of every line of
+    each media type in sorted order, as 8-byte integers. A page seeks straight
+    to its first item instead of reading the file from the start.
+    """
+
+    def __init__(self, results_dir):
+        """
+        Args:
+            results_dir (str): Folder holding the results, e.g., /opt/jellyfresh/results
+        """
+        self.results_dir = results_dir
+
+    def _path(self, run_id, extension):
+        return os.path.join(self.results_dir, f"{run_id}.{extension}")
+
+    @staticmethod
+    def _valid(run_id):
+        return bool(run_id) and all(c in '0123456789abcdef' for c in run_id)
+
+    def save(self, run_id, items, dry_run=False):
+        """
+        Write a scan's linked items.
+
+        Args:
+            run_id (str): The scan job id.
+            items (iterable): Item dicts, written in order.
+            dry_run (bool): Whether the items were only planned, not linked.
+
+        Returns:
+            dict: The run summary: id, time, dry_run and item counts per media type.
+        """
+        os.makedirs(self.results_dir, exist_ok=True)
+        counts = {"movies": 0, "shows": 0}
+        offsets = {None: array('Q')}  # None indexes every item, then one array per media type
+        position = 0
+        path = self._path(run_id, 'ndjson')
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            for item in items:
+                media_type = item['media_type']
+                line = (json.dumps(item) + '\n').encode('utf-8')
+                f.write(line)
+                offsets[None].append(position)
+                offsets.setdefault(media_type, array('Q')).append(position)
+                position += len(line)
+                counts[media_type] = counts.get(media_type, 0) + 1
+
+        index_path = self._path(run_id, 'idx')
+        with open(f"{index_path}.{os.getpid()}.tmp", 'wb') as f:
+            offsets[None].tofile(f)
+            for media_type in sorted(counts):
+                offsets.get(media_type, array('Q')).tofile(f)
+        os.replace(f"{index_path}.{os.getpid()}.tmp", index_path)
+        os.replace(tmp_path, path)
+
+        summary = {
+            "run_id": run_id,
+            "finished_at": datetime.now().isoformat(),
+            "dry_run": dry_run,
+            "counts": counts
+        }
+        summary_path = self._path(run_id, 'json')
+        with open(f"{summary_path}.{os.getpid()}.tmp", 'w') as f:
+            json.dump(summary, f)
+        os.replace(f"{summary_path}.{os.getpid()}.tmp", summary_path)
+
+        self._prune()
+        return summary
+
+    def summary(self, run_id):
+        """Return a run's summary, or None if it doesn't exist."""
+        if not self._valid(run_id):
+            return None
+        try:
+            with open(self._path(run_id, 'json'), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def latest(self):
+        """Return the id of the most recent run, or None."""
+        summaries = [self.summary(run_id) for run_id in self._run_ids()]
+        summaries = [summary for summary in summaries if summary]
+        if not summaries:
+            return None
+        return max(summaries, key=lambda summary: summary['finished_at'])['run_id']
+
+    def iter_items(self, run_id, media_type=None):
+        """
+        Yield a run's items in scan order, reading the file line by line.
+
+        Args:
+            run_id (str): The scan job id.
+            media_type (str, optional): Only yield 'movies' or 'shows'.
+        """
+        with open(self._path(run_id, 'ndjson'), 'r') as f:
+            for line in f:
+                item = json.loads(line)
+                if media_type is None or item['media_type'] == media_type:
+                    yield item
+
+    def _offsets(self, summary, media_type, start, count):
+        """
+        Read the byte offsets of `count` items from position `start` of a run's index.
+
+        Returns:
+            array: The offsets, or None for runs saved without an index.
+        """
+        counts = summary['counts']
+        base = 0
+        if media_type is not None:
+            base = sum(counts.values()) + sum(counts[other] for other in sorted(counts) if other < media_type)
+        offsets = array('Q')
+        try:
+            with open(self._path(summary['run_id'], 'idx'), 'rb') as f:
+                f.seek((base + start) * offsets.itemsize)
+                offsets.frombytes(f.read(count * offsets.itemsize))
+        except OSError:
+            return None
+        return offsets
+
+    def _read_lines(self, run_id, offsets, contiguous):
+        """Read the lines starting at the given byte offsets, in one pass when they follow each other."""
+        with open(self._path(run_id, 'ndjson'), 'rb') as f:
+            if contiguous and offsets:
+                f.seek(offsets[0])
+                return [f.readline().decode('utf-8') for _ in offsets]
+            lines = []
+            for offset in offsets:
+                f.seek(offset)
+                lines.append(f.readline().decode('utf-8'))
+            return lines
+
+    def iter_lines(self, run_id, media_type=None):
+        """Yield a run's NDJSON lines as stored, for streaming responses."""
+        summary = self.summary(run_id)
+        if media_type is not None and summary is not None and media_type in summary['counts']:
+            total = summary['counts'][media_type]
+            for start in range(0, total, STREAM_BATCH):
+                offsets = self._offsets(summary, media_type, start, min(STREAM_BATCH, total - start))
+                if offsets is None:
+                    break  # Saved before indexes existed
+                yield from self._read_lines(run_id, offsets, False)
+            else:
+                return
+
+        with open(self._path(run_id, 'ndjson'), 'r') as f:
+            for line in f:
+                if media_type is None or json.loads(line)['media_type'] == media_type:
+                    yield line
+
+    def page(self, run_id, offset=0, limit=DEFAULT_PAGE_SIZE, media_type=None):
+        """
+        Return one page of a run's items.
+
+        Args:
+            run_id (str): The scan job id.
+            offset (int): Number of items to skip.
+            limit (int): Most items to return, capped at MAX_PAGE_SIZE.
+            media_type (str, optional): Only count and return 'movies' or 'shows'.
+
+        Returns:
+            dict: The run summary with 'total', 'offset', 'items' and 'next_offset',
+                which is None on the last page. None if the run doesn't exist.
+        """
+        summary = self.summary(run_id)
+        if summary is None:
+            return None
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        offset = max(0, offset)
+        total = summary['counts'].get(media_type, 0) if media_type else sum(summary['counts'].values())
+
+        count = max(0, min(limit, total - offset))
+        offsets = self._offsets(summary, media_type, offset, count) if count else array('Q')
+        if offsets is not None:
+            items = [json.loads(line) for line in self._read_lines(run_id, offsets, media_type is None)]
+        else:
+            items = list(islice(self.iter_items(run_id, media_type), offset, offset + limit))
+        next_offset = offset + len(items)
+        return dict(
+            summary,
+            total=total,
+            offset=offset,
+            items=items,
+            next_offset=next_offset if next_offset < total else None
+        )
+
+    def _run_ids(self):
+        try:
+            return [name[:-5] for name in os.listdir(self.results_dir) if name.endswith('.json')]
+        except OSError:
+            return []
+
+    def _prune(self):
+        """Keep only the most recent runs."""
+        summaries = [self.summary(run_id) for run_id in self._run_ids()]
+        summaries = sorted((s for s in summaries if s), key=lambda s: s['finished_at'], reverse=True)
+        for summary in summaries[KEEP_RUNS:]:
+            for extension in ('ndjson', 'idx', 'json'):
+                try:
+                    os.remove(self._path(summary['run_id'], extension))
+                except OSError as e:
+                    logging.warning(f"Unable to remove old scan results {summary['run_id']}: {e}")
@@ -0,0 +1,420 @@
+import os
+import time
+import heapq
+import logging
+import sqlite3
+import threading
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+from datetime import timedelta
+from metadata_index import MetadataIndex
+from movie_processor import scan_movies
+from show_processor import scan_shows
+from contextlib import nullcontext
+from utils import (
+    clean_new_releases_folder, reconcile_new_releases_folder, file_lock, extract_nfo_tags, is_remote_path, paths_overlap
+)
+from scanner import LibraryScanner, FsCounter
+from pipeline import DEFAULT_PARSE_WORKERS, DEFAULT_QUEUE_SIZE
+
+# Defaults for the "scan" section of the configuration
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_PER_DEVICE_CONCURRENCY = 1
+DEFAULT_IO_MODE = 'auto'
+DEFAULT_IO_WORKERS = 16
+
+
+def get_device(path):
+    """Return the device id a path lives on, so libraries on one disk can be throttled together."""
+    try:
+        return os.stat(path).st_dev
+    except OSError:
+        return path  # Unreachable paths get their own slot
+
+
+def group_libraries(libraries):
+    """
+    Group library entries by (media type, media path).
+
+    Args:
+        libraries (list): Library entries as stored in the configuration.
+
+    Libraries whose media path is, contains or sits inside any spotlight
+    folder are skipped, e.g., a spotlight's own Jellyfin library saved by an
+    older version, so a spotlight never links to itself.
+
+    Returns:
+        dict: (media_type, media_path) -> {spotlight folder: time period}, the longest
+            period winning when a folder is configured twice. None stands for no window.
+    """
+    spotlight_folders = {library['new_releases_folder'] for library in libraries}
+    groups = {}
+    for library in libraries:
+        if any(paths_overlap(library['media_path'], folder) for folder in spotlight_folders):
+            logging.warning(f"Skipping media path {library['media_path']}, it overlaps a spotlight folder")
+            continue
+        targets = groups.setdefault((library['media_type'], library['media_path']), {})
+        time_period = library.get('time_period')
+        time_period = timedelta(seconds=time_period) if time_period is not None else None
+        folder = library['new_releases_folder']
+        if folder not in targets or (time_period is not None and targets[folder] is not None):
+            targets[folder] = max(time_period, targets.get(folder, time_period)) if time_period is not None else None
+        else:
+            targets[folder] = None
+    return groups
+
+
+def folder_limits(libraries):
+    """
+    Return how many of the newest items each spotlight folder keeps.
+
+    Args:
+        libraries (list): Library entries as stored in the configuration.
+
+    Returns:
+        dict: Spotlight folder -> limit, the largest winning, for folders with a 'limit'.
+    """
+    limits = {}
+    for library in libraries:
+        if library.get('limit'):
+            folder = library['new_releases_folder']
+            limits[folder] = max(int(library['limit']), limits.get(folder, 0))
+    return limits
+
+
+def trim_to_limits(items, plans, limits):
+    """
+    Keep the newest items of each limited folder across all the libraries feeding it.
+
+    Every library already kept at most `limit` items per folder, so this
+    only compares a few lists of that size.
+
+    Args:
+        items (list): Linked items of every library, see scan_movies and scan_shows.
+        plans (dict): Spotlight folder -> {link path: media file}, trimmed in place.
+        limits (dict): Spotlight folder -> number of items to keep.
+
+    Returns:
+        list: The items that stay, in their original order.
+    """
+    dropped = set()
+    for folder, limit in limits.items():
+        folder_items = [item for item in items if item['folder'] == folder]
+        if len(folder_items) <= limit:
+            continue
+        kept = {id(item) for item in heapq.nlargest(limit, folder_items, key=lambda item: (item['date'], item['title']))}
+        for item in folder_items:
+            if id(item) in kept:
+                continue
+            dropped.add(id(item))
+            # A movie links one file, a season a folder of episodes
+            season_prefix = os.path.join(item['link'], '')
+            for link_path in [path for path in plans.get(folder, {}) if path == item['link'] or path.startswith(season_prefix)]:
+                del plans[folder][link_path]
+    return [item for item in items if id(item) not in dropped]
+
+
+def open_index(index_file):
+    """Open the persistent NFO index, scans still work without it."""
+    if not index_file:
+        return None
+    try:
+        return MetadataIndex(index_file)
+    except (sqlite3.Error, OSError) as e:
+        logging.warning(f"Metadata index unavailable, parsing every NFO: {e}")
+        return None
+
+
+def io_modes(libraries, scan_options):
+    """
+    Decide which media paths and spotlight folders are handled in remote mode.
+
+    Args:
+        libraries (list): Library entries as stored in the configuration.
+        scan_options (dict): The "scan" configuration section, with 'io_mode' and
+            'library_io_modes', a path -> mode mapping overriding it.
+
+    Returns:
+        dict: Media path or spotlight folder -> True for remote mode.
+    """
+    default_mode = scan_options.get('io_mode', DEFAULT_IO_MODE)
+    overrides = scan_options.get('library_io_modes', {})
+    paths = {library['media_path'] for library in libraries} | {library['new_releases_folder'] for library in libraries}
+    remote = {path: is_remote_path(path, overrides.get(path, default_mode)) for path in paths}
+    for path in sorted(path for path, is_remote in remote.items() if is_remote):
+        logging.info(f"Remote mode for {path}: overlapping listings, reads and links")
+    return remote
+
+
+def process_parser(process_pool):
+    """Return an extract_nfo_tags replacement that parses in a worker process."""
+    def parse(nfo_path, tags):
+        return process_pool.submit(extract_nfo_tags, nfo_path, list(tags)).result()
+    return parse
+
+
+def run_scan(libraries, index_file=None, scan_options=None, link_mode='reconcile', dry_run=False, progress=None,
+             lock_file=None, metadata=None):
+    """
+    Scan every library and bring the spotlight folders up to date.
+
+    Libraries are grouped by media path so each tree is walked once, whatever
+    the number of spotlight folders it feeds. Independent media paths are
+    scanned concurrently by a bounded worker pool, with at most
+    `per_device_concurrency` scans running on the same device. Within a
+    library, the walk, the NFO reads and the link planning run as pipeline stages.
+    Libraries and spotlight folders on network mounts (or set to remote
+    `io_mode`) overlap their filesystem round-trips on a pool of `io_workers` threads.
+    Links are only written once every scan has finished, one task per
+    spotlight folder, so writes to a folder never interleave.
+
+    Args:
+        libraries (list): Library entries as stored in the configuration.
+        index_file (str, optional): Path to the persistent NFO index.
+        scan_options (dict, optional): The "scan" configuration section.
+        link_mode (str): 'reconcile' to only apply differences, 'rebuild' to wipe folders first.
+        dry_run (bool): Compute the link changes without touching the disk.
+        progress (callable, optional): Receives phase, items_scanned and items_linked keyword updates.
+        lock_file (str, optional): Inter-process lock held while spotlight folders are written.
+        metadata (MetadataBackend, optional): Source of metadata tried before the NFO files.
+
+    Returns:
+        dict: 'movies' and 'shows' linked item lists, see scan_movies and scan_shows, per-folder 'changes', 'index' hit/miss counts,
+            'fs_ops', the filesystem calls made while scanning, and 'metrics', the counts and
+            seconds per phase for each library and spotlight folder.
+    """
+    scan_options = scan_options or {}
+    max_workers = max(1, int(scan_options.get('max_workers', DEFAULT_MAX_WORKERS)))
+    io_workers = max(1, int(scan_options.get('io_workers', DEFAULT_IO_WORKERS)))
+    per_device = max(1, int(scan_options.get('per_device_concurrency', DEFAULT_PER_DEVICE_CONCURRENCY)))
+
+    parse_workers = max(0, int(scan_options.get('parse_workers', DEFAULT_PARSE_WORKERS)))
+    parse_backend = scan_options.get('parse_backend', 'thread')
+    queue_size = max(1, int(scan_options.get('queue_size', DEFAULT_QUEUE_SIZE)))
+
+    index = open_index(index_file)
+    snapshot = index if scan_options.get('directory_snapshot', True) else None
+    date_tag_options = scan_options.get('date_tags')
+
+    # NFOs are read by a shared pool while each library's walk continues. Threads
+    # overlap I/O waits on network mounts, worker processes add CPU for the XML
+    # parsing on fast local disks.
+    parse_pool = ThreadPoolExecutor(parse_workers, thread_name_prefix='parse') if parse_workers else None
+    process_pool = None
+    parse = None
+    if parse_pool is not None and parse_backend == 'process':
+        process_pool = ProcessPoolExecutor(parse_workers, mp_context=multiprocessing.get_context('spawn'))
+        parse = process_parser(process_pool)
+
+    # On network mounts every stat, listing, open and symlink is a round-trip.
+    # Remote paths share a larger pool of I/O threads that lists directories
+    # ahead of the walk, reads their NFOs and applies their link changes.
+    remote = io_modes(libraries, scan_options)
+    io_pool = ThreadPoolExecutor(io_workers, thread_name_prefix='io') if any(remote.values()) else None
+
+    # One walk per (media type, media path), evaluated against all of its spotlight folders
+    groups = group_libraries(libraries)
+    limits = folder_limits(libraries)
+
+    device_slots = defaultdict(lambda: threading.BoundedSemaphore(per_device))
+    for _, media_path in groups:
+        device_slots[get_device(media_path)]  # Create slots before workers start
+
+    fs_counter = FsCounter()
+    progress = progress or (lambda **fields: None)
+    scanned = [0]
+    scanned_lock = threading.Lock()
+
+    def on_item():
+        with scanned_lock:
+            scanned[0] += 1
+            progress(items_scanned=scanned[0])
+
+    def scan_group(media_type, media_path, targets):
+        plans = {}
+        if remote[media_path]:
+            scanner = LibraryScanner(fs_counter, on_item, snapshot, io_pool, None, queue_size, metadata,
+                                     io_pool, read_ahead=2 * io_workers)
+        else:
+            scanner = LibraryScanner(fs_counter, on_item, snapshot, parse_pool, parse, queue_size, metadata)
+        with device_slots[get_device(media_path)]:
+            if media_type == 'movies':
+                linked = scan_movies(media_path, list(targets.items()), index, plans, scanner,
+                                     limits=limits, date_tag_options=date_tag_options)
+            else:
+                linked = scan_shows(media_path, list(targets.items()), index, plans, scanner,
+                                    limits=limits, date_tag_options=date_tag_options)
+        return linked, plans, dict(scanner.phase_stats(), library=media_path, media_type=media_type)
+
+    linked_movies = []
+    linked_shows = []
+    plans = {}
+    started = time.perf_counter()
+    try:
+        progress(phase='scanning')
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scan') as pool:
+            futures = {
+                group: pool.submit(scan_group, *group, targets) for group, targets in groups.items()
+            }
+            results = {group: future.result() for group, future in futures.items()}
+
+            # Collect in library order so results keep the same order as a serial scan
+            collected = set()
+            for library in libraries:
+                group = (library['media_type'], library['media_path'])
+                folder = library['new_releases_folder']
+                if (group, folder) in collected or group not in results:
+                    continue  # Seen already, or skipped by group_libraries
+                collected.add((group, folder))
+
+                linked, group_plans, _ = results[group]
+                if library['media_type'] == 'movies':
+                    linked_movies.extend(linked[folder])
+                else:
+                    linked_shows.extend(linked[folder])
+                folder_plan = plans.setdefault(folder, {})
+                for link_path, target in group_plans.get(folder, {}).items():
+                    folder_plan.setdefault(link_path, target)
+
+            if limits:
+                # Each library kept its newest items, keep the newest of those per folder
+                kept = trim_to_limits(linked_movies + linked_shows, plans, limits)
+                linked_movies = [item for item in kept if item['media_type'] == 'movies']
+                linked_shows = [item for item in kept if item['media_type'] == 'shows']
+
+            progress(
+                force=True,
+                phase='linking',
+                items_scanned=scanned[0],
+                items_linked=len(linked_movies) + len(linked_shows)
+            )
+
+            def link_folder(new_releases_folder, desired):
+                phases = {}
+                if link_mode == 'rebuild' and not dry_run:
+                    clean_started = time.perf_counter()
+                    clean_new_releases_folder(new_releases_folder)
+                    phases['clean'] = round(time.perf_counter() - clean_started, 4)
+                link_started = time.perf_counter()
+                folder_pool = io_pool if remote[new_releases_folder] else None
+                folder_changes = reconcile_new_releases_folder(new_releases_folder, desired, dry_run, pool=folder_pool)
+                phases['link'] = round(time.perf_counter() - link_started, 4)
+                return folder_changes, phases
+
+            with file_lock(lock_file) if lock_file else nullcontext():
+                link_futures = {
+                    folder: pool.submit(link_folder, folder, desired) for folder, desired in plans.items()
+                }
+                wait(link_futures.values())
+
+            changes = {}
+            folder_metrics = []
+            for new_releases_folder, future in link_futures.items():
+                folder_changes, phases = future.result()
+                folder_metrics.append({
+                    "folder": new_releases_folder,
+                    "links_created": 0 if dry_run else len(folder_changes['add']),
+                    "links_removed": 0 if dry_run else len(folder_changes['remove']) + len(folder_changes['remove_dirs']),
+                    "phases": phases
+                })
+                if dry_run:
+                    changes[new_releases_folder] = {
+                        "add": sorted(folder_changes['add']),
+                        "remove": sorted(folder_changes['remove']),
+                        "remove_dirs": sorted(folder_changes['remove_dirs'])
+                    }
+                else:
+                    changes[new_releases_folder] = {
+                        "added": len(folder_changes['add']),
+                        "removed": len(folder_changes['remove']) + len(folder_changes['remove_dirs'])
+                    }
+
+        index_stats = {"hits": 0, "misses": 0, "dir_hits": 0, "dir_misses": 0}
+        if index is not None:
+            # Every library was fully walked, so anything unseen no longer exists
+            for _, media_path in groups:
+                index.prune(media_path)
+            index_stats = index.stats()
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown()
+        if io_pool is not None:
+            io_pool.shutdown()
+        if process_pool is not None:
+            process_pool.shutdown()
+        if index is not None:
+            index.close()
+
+    return {
+        "movies": linked_movies,
+        "shows": linked_shows,
+        "changes": changes,
+        "index": index_stats,
+        "fs_ops": fs_counter.snapshot(),
+        "metrics": {
+            "duration_seconds": round(time.perf_counter() - started, 4),
+            "libraries": [library_metrics for _, _, library_metrics in results.values()],
+            "folders": folder_metrics
+        }
+    }
+
+
+def run_incremental_scan(libraries, units, index_file=None, lock_file=None, metadata=None, scan_options=None):
+    """
+    Rescan only the parts of the libraries that changed, e.g., after a filesystem event.
+
+    Each unit is a movie folder, a season or a whole show. Only links pointing
+    inside a unit's scope are added or removed, the rest of every spotlight
+    folder is left alone. Folders keeping the newest N items are skipped, one
+    new item can push out another anywhere in the library, so they need a full scan.
+
+    Args:
+        libraries (list): Library entries as stored in the configuration.
+        units (dict): (media_type, media_path) -> set of (scope, scan_root, season_path) tuples,
+            where scan_root is None when the scope no longer exists and season_path
+            limits a show scan to one season.
+        index_file (str, optional): Path to the persistent NFO index.
+        lock_file (str, optional): Inter-process lock held while spotlight folders are written.
+        metadata (MetadataBackend, optional): Source of metadata tried before the NFO files.
+        scan_options (dict, optional): The "scan" configuration section, for its 'date_tags'
+            and 'directory_snapshot' settings.
+
+    Returns:
+        dict: Spotlight folder -> {'added': n, 'removed': n}.
+    """
+    groups = group_libraries(libraries)
+    limits = folder_limits(libraries)
+    scan_options = scan_options or {}
+    date_tag_options = scan_options.get('date_tags')
+    index = open_index(index_file)
+    snapshot = index if scan_options.get('directory_snapshot', True) else None
+    scanner = LibraryScanner(snapshot=snapshot, metadata=metadata)
+    changes = {}
+    try:
+        for group, group_units in units.items():
+            targets = {folder: period for folder, period in groups.get(group, {}).items() if folder not in limits}
+            if not targets:
+                continue
+            media_type, _ = group
+
+            for scope, scan_root, season_path in group_units:
+                plans = {}
+                if scan_root is not None and media_type == 'movies':
+                    scan_movies(scan_root, list(targets.items()), index, plans, scanner, date_tag_options=date_tag_options)
+                elif scan_root is not None:
+                    only_seasons = {season_path} if season_path else None
+                    scan_shows(scan_root, list(targets.items()), index, plans, scanner, only_seasons,
+                               date_tag_options=date_tag_options)
+
+                with file_lock(lock_file) if lock_file else nullcontext():
+                    for folder in targets:
+                        folder_changes = reconcile_new_releases_folder(folder, plans.get(folder, {}), scope=[scope])
+                        totals = changes.setdefault(folder, {"added": 0, "removed": 0})
+                        totals['added'] += len(folder_changes['add'])
+                        totals['removed'] += len(folder_changes['remove']) + len(folder_changes['remove_dirs'])
+    finally:
+        if index is not None:
+            index.close()
+
+    return changes
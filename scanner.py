@@ -0,0 +1,411 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from collections import Counter, namedtuple
+from concurrent.futures import Future
+from utils import extract_nfo_tags
+from pipeline import prefetch, ordered_map, DEFAULT_QUEUE_SIZE
+
+VIDEO_EXTENSIONS = ('.mkv', '.mp4', '.avi', '.mov', '.wmv', '.flv')
+
+# A video file and the NFO that describes it (nfo_path is None when there is none)
+MovieCandidate = namedtuple('MovieCandidate', 'folder file video_path nfo_path nfo_entry')
+EpisodeCandidate = namedtuple('EpisodeCandidate', 'file video_path nfo_path nfo_entry')
+SeasonCandidate = namedtuple('SeasonCandidate', 'season_dir season_path nfo_path nfo_entry episodes')
+ShowCandidate = namedtuple('ShowCandidate', 'show_path nfo_path nfo_entry seasons')
+
+
+class DirListing:
+    """The entries of one directory, read with a single os.scandir call."""
+
+    def __init__(self, path, entries):
+        self.path = path
+        self.files = {}
+        self.dirs = {}
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    self.dirs[entry.name] = entry
+                else:
+                    self.files[entry.name] = entry
+            except OSError:
+                continue  # Broken entry, e.g., a dangling link on a network share
+
+    def videos(self):
+        """Return the names of the video files in this directory."""
+        return [name for name in self.files if name.lower().endswith(VIDEO_EXTENSIONS)]
+
+    def sidecar_nfo(self, file):
+        """Return the name of the X.nfo next to X.mkv, or None."""
+        nfo_name = os.path.splitext(file)[0] + '.nfo'
+        return nfo_name if nfo_name in self.files else None
+
+
+class CachedEntry:
+    """Stands in for an os.DirEntry when a listing comes from the directory snapshot."""
+
+    def __init__(self, path, is_dir=False, is_symlink=False):
+        self.path = path
+        self.name = os.path.basename(path)
+        self._is_dir = is_dir
+        self._is_symlink = is_symlink
+
+    def is_dir(self):
+        return self._is_dir
+
+    def is_symlink(self):
+        return self._is_symlink
+
+    def stat(self):
+        return os.stat(self.path)
+
+
+class FsCounter:
+    """Thread-safe counts, e.g., of the filesystem calls made during a scan."""
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, op, count=1):
+        with self._lock:
+            self._counts[op] += count
+
+    def snapshot(self):
+        """Return the counts so far, e.g., {'scandir': 120, 'stat': 800, 'open': 3}."""
+        with self._lock:
+            return dict(self._counts)
+
+
+class LibraryScanner:
+    """
+    Walks a media library listing every directory exactly once with os.scandir.
+
+    Questions such as "does X.nfo exist next to X.mkv" are answered from the
+    cached listing instead of extra stat calls, and every directory access is
+    recorded in an FsCounter.
+    """
+
+    def __init__(self, counter=None, on_item=None, snapshot=None, pool=None, parse=None,
+                 queue_size=DEFAULT_QUEUE_SIZE, metadata=None, io_pool=None, read_ahead=0):
+        """
+        Args:
+            counter (FsCounter, optional): Counter to record filesystem calls in.
+            on_item (callable, optional): Called once per movie or season found, for progress reporting.
+            snapshot (MetadataIndex, optional): Index holding directory listings from earlier scans.
+                Directories whose mtime hasn't changed are then stat'ed instead of listed.
+            pool (Executor, optional): Worker threads reading NFOs while the walk continues.
+            parse (callable, optional): Replaces extract_nfo_tags, e.g., to parse in worker processes.
+            queue_size (int): Candidates buffered between the walk, the readers and the caller.
+            metadata (MetadataBackend, optional): Source of metadata tried before the NFO files.
+            io_pool (Executor, optional): Threads listing directories ahead of the walk, for
+                network mounts where every listing is a round-trip.
+            read_ahead (int): Directories the walk keeps being listed in io_pool.
+        """
+        self.counter = counter or FsCounter()
+        self.on_item = on_item
+        self.snapshot = snapshot
+        self.pool = pool
+        self.parse = parse or extract_nfo_tags
+        self.queue_size = queue_size
+        self.metadata = metadata
+        self.io_pool = io_pool
+        self.read_ahead = read_ahead if io_pool is not None else 0
+        self.stats = FsCounter()  # Directories, NFOs parsed, failures and seconds per phase
+
+    @contextmanager
+    def timed(self, phase):
+        """Add the time spent in the block to the phase's total, e.g., 'walk' or 'parse'."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stats.add(f'{phase}_seconds', time.perf_counter() - started)
+
+    def phase_stats(self):
+        """
+        Return what this scanner did, for metrics.
+
+        Returns:
+            dict: 'directories', 'items', 'nfo_parsed', 'parse_failures', 'date_errors'
+                counts, and 'phases' seconds per phase.
+        """
+        stats = self.stats.snapshot()
+        result = {
+            name: stats.get(name, 0)
+            for name in ('directories', 'items', 'nfo_parsed', 'parse_failures', 'date_errors')
+        }
+        result['phases'] = {
+            name[:-len('_seconds')]: round(value, 4) for name, value in stats.items() if name.endswith('_seconds')
+        }
+        return result
+
+    def pipeline(self, candidates, read):
+        """
+        Apply read to every candidate and yield the results in walk order.
+
+        With a pool, the walk runs in its own thread and feeds a bounded queue,
+        the pool's workers read the NFOs, and the caller consumes the results
+        as a single stage. Without one, everything runs inline.
+
+        Args:
+            candidates (iterable): Output of iter_movies or iter_shows.
+            read (callable): Reads the metadata of one candidate.
+        """
+        if self.pool is None:
+            return map(read, candidates)
+        return ordered_map(self.pool, read, prefetch(candidates, self.queue_size), self.queue_size)
+
+    def list_dir(self, path):
+        """
+        List a directory once, or reuse its snapshot if it hasn't changed.
+
+        Args:
+            path (str): Directory to list.
+
+        Returns:
+            DirListing: The listing, empty if the directory can't be read.
+        """
+        self.stats.add('directories')
+        with self.timed('walk'):
+            return self._list_dir(path)
+
+    def _list_dir(self, path):
+        mtime_ns = None
+        if self.snapshot is not None:
+            self.counter.add('stat')
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError as e:
+                logging.error(f"Unable to list {path}: {e}")
+                return DirListing(path, [])
+            cached = self.snapshot.get_listing(path, mtime_ns)
+            if cached is not None:
+                entries = [
+                    CachedEntry(os.path.join(path, name), True, is_symlink)
+                    for name, is_symlink in cached['dirs'].items()
+                ]
+                entries.extend(CachedEntry(os.path.join(path, name)) for name in cached['files'])
+                return DirListing(path, entries)
+
+        self.counter.add('scandir')
+        try:
+            with os.scandir(path) as it:
+                listing = DirListing(path, list(it))
+        except OSError as e:
+            logging.error(f"Unable to list {path}: {e}")
+            return DirListing(path, [])
+
+        if mtime_ns is not None:
+            self.snapshot.put_listing(path, mtime_ns, {
+                'dirs': {name: entry.is_symlink() for name, entry in listing.dirs.items()},
+                'files': list(listing.files)
+            })
+        return listing
+
+    def walk(self, media_path):
+        """
+        Yield a DirListing for every directory under media_path, top-down.
+
+        Listings already produced by the caller can be handed back through the
+        generator's send() to avoid listing them again (a None listing prunes that
+        directory); symlinked directories are listed but not descended into, like os.walk.
+        With an io_pool, the next read_ahead directories are listed while the
+        current one is processed.
+        """
+        stack = [self.list_dir(media_path)]  # Listings, pending listings, or paths still to list
+        while stack:
+            listing = self._resolve(stack.pop())
+            prelisted = yield listing
+            prelisted = prelisted or {}
+            for name, entry in reversed(list(listing.dirs.items())):
+                child = os.path.join(listing.path, name)
+                if entry.is_symlink():
+                    continue
+                if child in prelisted:
+                    if prelisted[child] is not None:
+                        stack.append(prelisted[child])
+                    continue
+                stack.append(child)
+            self._list_ahead(stack)
+
+    def _resolve(self, item):
+        """Return the listing for a walk stack item."""
+        if isinstance(item, str):
+            return self.list_dir(item)
+        if isinstance(item, Future):
+            return item.result()
+        return item
+
+    def _list_ahead(self, stack):
+        """Start listing the directories the walk pops next, so their round-trips overlap."""
+        for i in range(len(stack) - 1, max(-1, len(stack) - 1 - self.read_ahead), -1):
+            if isinstance(stack[i], str):
+                stack[i] = self.io_pool.submit(self.list_dir, stack[i])
+
+    def list_dirs(self, paths):
+        """List several directories, concurrently when there is an io_pool, in the given order."""
+        if self.io_pool is None:
+            return [self.list_dir(path) for path in paths]
+        return list(self.io_pool.map(self.list_dir, paths))
+
+    def iter_movies(self, media_path):
+        """
+        Yield a MovieCandidate for every video file in a movies library.
+
+        The NFO is the video's own X.nfo, else the folder's movie.nfo.
+        """
+        for listing in self.walk(media_path):
+            logging.debug("Scanning folder: %s", listing.path)
+            for file in listing.videos():
+                nfo_name = listing.sidecar_nfo(file)
+                if nfo_name is None and 'movie.nfo' in listing.files:
+                    nfo_name = 'movie.nfo'
+                self.stats.add('items')
+                if self.on_item:
+                    self.on_item()
+                yield MovieCandidate(
+                    folder=listing.path,
+                    file=file,
+                    video_path=os.path.join(listing.path, file),
+                    nfo_path=os.path.join(listing.path, nfo_name) if nfo_name else None,
+                    nfo_entry=listing.files[nfo_name] if nfo_name else None,
+                )
+
+    def iter_shows(self, media_path, only_seasons=None):
+        """
+        Yield a ShowCandidate for every folder holding a tvshow.nfo, or known to the
+        metadata backend as a show, with its seasons.
+
+        Each season directory is listed once, and that listing is reused when the
+        walk continues below the show. When only_seasons is given, other season
+        directories are skipped entirely.
+        """
+        walker = self.walk(media_path)
+        prelisted = None
+        while True:
+            try:
+                listing = walker.send(prelisted)
+            except StopIteration:
+                return
+            prelisted = None
+            logging.debug("Scanning folder: %s", listing.path)
+
+            has_nfo = 'tvshow.nfo' in listing.files
+            if not has_nfo and not (self.metadata and self.metadata.is_show(listing.path)):
+                continue
+
+            seasons = []
+            prelisted = {}
+            season_dirs = []
+            for season_dir in listing.dirs:
+                season_path = os.path.join(listing.path, season_dir)
+                if only_seasons is not None and season_path not in only_seasons:
+                    prelisted[season_path] = None
+                    continue
+                season_dirs.append(season_dir)
+            season_listings = self.list_dirs([os.path.join(listing.path, season_dir) for season_dir in season_dirs])
+
+            for season_dir, season_listing in zip(season_dirs, season_listings):
+                season_path = season_listing.path
+                prelisted[season_path] = season_listing
+
+                episodes = []
+                for file in season_listing.videos():
+                    nfo_name = season_listing.sidecar_nfo(file)
+                    episodes.append(EpisodeCandidate(
+                        file=file,
+                        video_path=os.path.join(season_path, file),
+                        nfo_path=os.path.join(season_path, nfo_name) if nfo_name else None,
+                        nfo_entry=season_listing.files[nfo_name] if nfo_name else None,
+                    ))
+                has_season_nfo = 'season.nfo' in season_listing.files
+                seasons.append(SeasonCandidate(
+                    season_dir=season_dir,
+                    season_path=season_path,
+                    nfo_path=os.path.join(season_path, 'season.nfo') if has_season_nfo else None,
+                    nfo_entry=season_listing.files['season.nfo'] if has_season_nfo else None,
+                    episodes=episodes,
+                ))
+
+            self.stats.add('items', len(seasons))
+            if self.on_item:
+                for _ in seasons:
+                    self.on_item()
+            yield ShowCandidate(
+                show_path=listing.path,
+                nfo_path=os.path.join(listing.path, 'tvshow.nfo') if has_nfo else None,
+                nfo_entry=listing.files['tvshow.nfo'] if has_nfo else None,
+                seasons=seasons,
+            )
+
+    def read_tags(self, nfo_path, nfo_entry, tags, index=None):
+        """
+        Read tags from an NFO found by the scanner, reusing its DirEntry for the index stat.
+
+        Args:
+            nfo_path (str): Path to the .nfo file.
+            nfo_entry (os.DirEntry): The NFO's directory entry.
+            tags (iterable): The XML tags to read.
+            index (MetadataIndex, optional): Persistent NFO index to skip unchanged files.
+
+        Returns:
+            dict: Tag name to text content (None when a tag is not found).
+        """
+        if index is not None:
+            try:
+                st = nfo_entry.stat()
+                self.counter.add('stat')
+            except OSError:
+                st = None
+            if st is not None:
+                values, parsed = index.lookup_stat(nfo_path, st, tags, self.parse)
+                if parsed:
+                    self.counter.add('open')
+                    self._count_parse(values)
+                return values
+
+        self.counter.add('open')
+        values = self.parse(nfo_path, tags)
+        self._count_parse(values)
+        return values
+
+    def _count_parse(self, values):
+        self.stats.add('nfo_parsed')
+        if all(value is None for value in values.values()):
+            self.stats.add('parse_failures')
+
+    def read_item(self, item_path, nfo_path, nfo_entry, tags, index=None):
+        """
+        Read tags for a movie, show, season or episode.
+
+        The metadata backend is asked first. The item's NFO, when there is one,
+        fills in whatever the backend doesn't know.
+
+        Args:
+            item_path (str): Video file, season folder or show folder.
+            nfo_path (str): Path to the item's .nfo file, or None.
+            nfo_entry (os.DirEntry): The NFO's directory entry, or None.
+            tags (iterable): The XML tags to read.
+            index (MetadataIndex, optional): Persistent NFO index to skip unchanged files.
+
+        Returns:
+            dict: Tag name to value (None when a tag is not found), or None when
+                neither the backend nor an NFO describes the item.
+        """
+        with self.timed('parse'):
+            return self._read_item(item_path, nfo_path, nfo_entry, tags, index)
+
+    def _read_item(self, item_path, nfo_path, nfo_entry, tags, index):
+        values = self.metadata.lookup(item_path, tags) if self.metadata else None
+        if values is not None and all(value is not None for value in values.values()):
+            return values
+        if nfo_path is None:
+            return values
+
+        nfo_values = self.read_tags(nfo_path, nfo_entry, tags, index)
+        if values is None:
+            return nfo_values
+        return {tag: values[tag] if values[tag] is not None else nfo_values[tag] for tag in tags}
@@ -1,73 +1,142 @@
 import os
 import logging
+import itertools
 from datetime import datetime
-from utils import parse_nfo
+from utils import keep_newest
+from scanner import LibraryScanner
+from dates import date_tags, resolve_date
 
-def process_shows(media_path, new_releases_folder, time_period):
+def scan_shows(media_path, targets, index=None, plans=None, scanner=None, only_seasons=None, limits=None,
+               date_tag_options=None):
     """
-    Process TV shows and link recent seasons to the new releases folder.
+    Walk a TV shows library once and plan season links for every spotlight folder it feeds.
 
     Args:
         media_path (str): Path to the TV shows library.
-        new_releases_folder (str): Path to the new releases folder.
-        time_period (timedelta): Time period to filter recent shows.
+        targets (list): (new_releases_folder, time_period) pairs to evaluate each season against,
+            a None time_period meaning no window.
+        index (MetadataIndex, optional): Persistent NFO index to skip unchanged files.
+        plans (dict, optional): Spotlight folder -> {link path: media file}, filled in place.
+        scanner (LibraryScanner, optional): Scanner to walk with, e.g., to share its syscall counter.
+        only_seasons (set, optional): Season folder paths to limit the scan to.
+        limits (dict, optional): Spotlight folder -> number of most recently aired seasons to keep.
+            These are picked with a heap of that size, then linked newest first.
+        date_tag_options (dict, optional): Media type -> NFO tags tried for aired dates, see dates.date_tags.
+
+    Returns:
+        dict: Spotlight folder -> list of linked seasons, each a dict with the media_type,
+            "Show - Season N" title, show, season, newest aired date, source season
+            folder, link folder and spotlight folder.
     """
-    cutoff_date = datetime.now() - time_period
-    linked_shows = set()  # To avoid duplicates
+    now = datetime.now()
+    cutoffs = [(folder, now - time_period if time_period is not None else None) for folder, time_period in targets]
+    plans = {} if plans is None else plans
+    scanner = scanner or LibraryScanner()
+    linked_shows = {folder: {} for folder, _ in targets}  # Ordered sets, to avoid duplicates
+    limits = {folder: limit for folder, limit in (limits or {}).items() if folder in linked_shows}
+    newest = {folder: [] for folder in limits}  # Bounded heaps of the newest seasons per limited folder
+    sequence = itertools.count()  # Breaks ties between seasons that aired the same day
+
+    # Stop reading a season's episodes once one is recent enough for every folder,
+    # unless seasons are ranked by their newest episode or a folder has no window
+    newest_cutoff = None
+    if not limits and all(cutoff_date is not None for _, cutoff_date in cutoffs):
+        newest_cutoff = max(cutoff_date for _, cutoff_date in cutoffs)
 
     logging.info(f"Processing TV shows from: {media_path}")
-    logging.info(f"Cutoff date for new releases: {cutoff_date}")
-
-    for root, dirs, files in os.walk(media_path):
-        logging.info(f"Scanning folder: {root}")
-
-        # Check for a TV show folder by locating tvshow.nfo
-        if 'tvshow.nfo' in files:
-            show_title = parse_nfo(os.path.join(root, 'tvshow.nfo'), 'title') or os.path.basename(root)
-            logging.info(f"Found TV show: {show_title}")
-
-            for season_dir in dirs:
-                season_path = os.path.join(root, season_dir)
-
-                # Check for a season.nfo in the season directory
-                if 'season.nfo' in os.listdir(season_path):
-                    season_title = parse_nfo(os.path.join(season_path, 'season.nfo'), 'seasonnumber') or season_dir
-
-                    # Check all episodes in the season for aired dates
-                    add_season = False
-                    for episode_file in os.listdir(season_path):
-                        if episode_file.lower().endswith(('.mkv', '.mp4', '.avi', '.mov', '.wmv', '.flv')):
-                            episode_nfo = os.path.splitext(os.path.join(season_path, episode_file))[0] + '.nfo'
-                            if os.path.exists(episode_nfo):
-                                aired_date_str = parse_nfo(episode_nfo, 'aired')
-                                try:
-                                    aired_date = datetime.strptime(aired_date_str, '%Y-%m-%d') if aired_date_str else None
-                                    if aired_date and aired_date >= cutoff_date:
-                                        add_season = True
-                                        break  # Stop checking after one valid episode
-                                except ValueError:
-                                    logging.error(f"Invalid aired date in {episode_nfo}. Skipping episode.")
-                                    continue
-
-                    if add_season:
-                        # Add entire season to new releases
-                        season_folder = os.path.join(new_releases_folder, show_title, f"Season {season_title}")
-                        os.makedirs(season_folder, exist_ok=True)
-
-                        for episode in os.listdir(season_path):
-                            if episode.lower().endswith(('.mkv', '.mp4', '.avi', '.mov', '.wmv', '.flv')):
-                                episode_file_path = os.path.join(season_path, episode)
-                                episode_link = os.path.join(season_folder, episode)
-
-                                if not os.path.exists(episode_link):
-                                    os.symlink(episode_file_path, episode_link)
-                                    logging.info(f"Linked {episode_file_path} to {episode_link}")
-
-                        # Record the show and season to avoid duplicates
-                        linked_shows.add(f"{show_title} - Season {season_title}")
-
-    logging.info(f"Total shows/seasons linked: {len(linked_shows)}")
-    return list(linked_shows)  # Return linked shows/seasons for web results
-
-
-
+    for folder, cutoff_date in cutoffs:
+        logging.info(f"Cutoff date for new releases in {folder}: {cutoff_date}")
+        if folder in limits:
+            logging.info(f"Keeping the newest {limits[folder]} seasons in {folder}")
+
+    aired_date_tags = date_tags('shows', date_tag_options)
+
+    def read_show(show):
+        """Read the show's title and the title and newest aired date of each season."""
+        show_tags = scanner.read_item(show.show_path, show.nfo_path, show.nfo_entry, ('title',), index) or {}
+        show_title = show_tags.get('title') or os.path.basename(show.show_path)
+        seasons = []
+        for season in show.seasons:
+            # Only folders with a season.nfo, or known to the metadata backend, are seasons
+            season_tags = scanner.read_item(season.season_path, season.nfo_path, season.nfo_entry, ('seasonnumber',), index)
+            if season_tags is None:
+                continue
+            season_title = season_tags['seasonnumber'] or season.season_dir
+
+            # Find the newest aired date among the season's episodes
+            newest_aired = None
+            for episode in season.episodes:
+                episode_tags = scanner.read_item(episode.video_path, episode.nfo_path, episode.nfo_entry, aired_date_tags, index)
+                if episode_tags is None:
+                    continue
+                try:
+                    with scanner.timed('dates'):
+                        aired_date = resolve_date(episode_tags, aired_date_tags)
+                except ValueError as e:
+                    scanner.stats.add('date_errors')
+                    logging.error(f"{e} in {episode.nfo_path or episode.video_path}. Skipping episode.")
+                    continue
+                if aired_date and (newest_aired is None or aired_date > newest_aired):
+                    newest_aired = aired_date
+                    if newest_cutoff is not None and newest_aired >= newest_cutoff:
+                        break  # Recent enough for every spotlight folder
+
+            seasons.append((season, season_title, newest_aired))
+        return show_title, seasons
+
+    # Shows are read by the scanner's pool while the walk continues, results arrive in walk order
+    show_count = season_count = 0
+    for show_title, seasons in scanner.pipeline(scanner.iter_shows(media_path, only_seasons), read_show):
+        logging.debug("Found TV show: %s", show_title)
+        show_count += 1
+        season_count += len(seasons)
+
+        for season, season_title, newest_aired in seasons:
+            if newest_aired is None:
+                continue
+
+            for folder, cutoff_date in cutoffs:
+                if cutoff_date is not None and newest_aired < cutoff_date:
+                    continue
+
+                # Add entire season to new releases
+                season_folder = os.path.join(folder, show_title, f"Season {season_title}")
+                season_links = {
+                    os.path.join(season_folder, episode.file): episode.video_path for episode in season.episodes
+                }
+                linked_season = {
+                    "media_type": "shows",
+                    "title": f"{show_title} - Season {season_title}",
+                    "show": show_title,
+                    "season": season_title,
+                    "date": newest_aired.date().isoformat(),
+                    "source": season.season_path,
+                    "link": season_folder,
+                    "folder": folder
+                }
+                if folder in limits:
+                    key = (newest_aired, linked_season['title'], next(sequence))
+                    keep_newest(newest[folder], limits[folder], key, (linked_season, season_links))
+                    continue
+
+                links = plans.setdefault(folder, {})
+                for link_path, video_path in season_links.items():
+                    links.setdefault(link_path, video_path)
+
+                # Record the show and season to avoid duplicates
+                linked_shows[folder].setdefault(linked_season['title'], linked_season)
+
+    # Link what stayed in the heaps, newest first
+    for folder, heap in newest.items():
+        links = plans.setdefault(folder, {})
+        for _, (linked_season, season_links) in sorted(heap, key=lambda entry: entry[0], reverse=True):
+            for link_path, video_path in season_links.items():
+                links.setdefault(link_path, video_path)
+            linked_shows[folder].setdefault(linked_season['title'], linked_season)
+
+    # Per-show lines are logged at DEBUG, summarize the library at INFO
+    logging.info(f"TV shows in {media_path}: {show_count} shows, {season_count} seasons found")
+    for folder, linked in linked_shows.items():
+        logging.info(f"Seasons linked to {folder}: {len(linked)}")
+    logging.info(f"Total shows/seasons linked: {sum(len(seasons) for seasons in linked_shows.values())}")
+    return {folder: list(seasons.values()) for folder, seasons in linked_shows.items()}
@@ -12,6 +12,7 @@ function addLibrary(libraryData = null) {
     const mediaType = libraryData?.media_type || "movies";
     const timePeriod = libraryData?.time_period || "1_week";
     const newReleasesFolder = libraryData?.new_releases_folder || "";
+    const limit = libraryData?.limit || "";
 
     libraryDiv.innerHTML = `
         <div class="library-header">
@@ -41,8 +42,16 @@ function addLibrary(libraryData = null) {
             <option value="2_months" ${timePeriod === "2_months" ? "selected" : ""}>Last 2 Months</option>
             <option value="6_months" ${timePeriod === "6_months" ? "selected" : ""}>Last 6 Months</option>
             <option value="1_year" ${timePeriod === "1_year" ? "selected" : ""}>Last Year</option>
+            <option value="any" ${timePeriod === "any" ? "selected" : ""}>Any Time</option>
         </select>
 
+        <span class="info-container">
+            <label for="limit-${libraryCount + 1}">Keep Newest</label>
+            <span class="info-icon">i</span>
+            <span class="tooltip">Optional, only keep this many of the newest items<br>Example:<br>Any Time and 20 keeps the 20 newest movies<br>Leave empty to keep everything in the time period</span>
+        </span>
+        <input type="number" id="limit-${libraryCount + 1}" name="limit-${libraryCount + 1}" min="1" placeholder="All" value="${limit}">
+
         <span class="info-container">
             <label for="new_releases_folder-${libraryCount + 1}">New Releases Folder</label>
             <span class="info-icon">i</span>
@@ -81,7 +90,8 @@ document.addEventListener('DOMContentLoaded', () => {
                     addLibrary({
                         media_type: library.media_type,
                         time_period: getPeriodKey(library.time_period),
-                        new_releases_folder: library.new_releases_folder
+                        new_releases_folder: library.new_releases_folder,
+                        limit: library.limit
                     });
                 });
             } else {
@@ -102,6 +112,9 @@ document.addEventListener('DOMContentLoaded', () => {
 
 // Helper function to map time_period to dropdown keys
 function getPeriodKey(timePeriod) {
+    if (timePeriod === null) {
+        return "any";
+    }
     const periods = {
         604800: "1_week",
         1209600: "2_weeks",
@@ -116,35 +129,117 @@ function getPeriodKey(timePeriod) {
 /////////////////////////////////////////////////////////////////////
 // Show results after scan/Retrieve latest logs
 ///////////////////////////////////////////////////////////////////// 
+const LOG_POLL_MS = 5000; // How often to check for new log lines once the follow stream goes idle
+
 document.addEventListener("DOMContentLoaded", () => {
     const logsButton = document.getElementById("toggle-logs-button");
     const logsSection = document.getElementById("logs");
     const logContent = document.getElementById("log-content");
+    let logCursor = null;
+    let logEvents = null;
+    let logPollTimer = null;
+
+    // Append new lines instead of replacing the whole log, keeping the view at the bottom if it was there
+    function appendLog(text, reset) {
+        const atBottom = logsSection.scrollHeight - logsSection.scrollTop - logsSection.clientHeight < 20;
+        if (reset) {
+            logContent.textContent = "";
+        }
+        if (text) {
+            logContent.appendChild(document.createTextNode(text));
+        }
+        if (atBottom || reset) {
+            logsSection.scrollTop = logsSection.scrollHeight;
+        }
+    }
+
+    function stopFollowing() {
+        if (logEvents) {
+            logEvents.close();
+            logEvents = null;
+        }
+        clearTimeout(logPollTimer);
+        logPollTimer = null;
+    }
+
+    // Fetch the lines written since the cursor, the end of the newest log if there is none yet
+    function fetchLog() {
+        const url = logCursor ? `/logs/recent?cursor=${encodeURIComponent(logCursor)}` : "/logs/recent";
+        return fetch(url).then((response) => {
+            if (!response.ok) {
+                throw new Error("Failed to fetch logs.");
+            }
+            logCursor = response.headers.get("X-Log-Cursor");
+            const reset = response.headers.get("X-Log-Reset") === "1";
+            return response.text().then((text) => {
+                appendLog(text, reset);
+                return text.length > 0;
+            });
+        });
+    }
 
-    // Toggle visibility of logs and fetch new logs on each click
+    // Keep watching the log only while it is shown, a fetch may finish after the pane was closed
+    function resumeLog(changed) {
+        if (!logsSection.classList.contains("open")) {
+            return;
+        }
+        if (changed) {
+            followLog();
+        } else {
+            pollLog();
+        }
+    }
+
+    // Poll cheaply while nothing is logged, and go back to streaming once a scan writes again
+    function pollLog() {
+        stopFollowing();
+        logPollTimer = setTimeout(() => {
+            fetchLog()
+                .then(resumeLog)
+                .catch(() => resumeLog(false));
+        }, LOG_POLL_MS);
+    }
+
+    function followLog() {
+        stopFollowing();
+        if (!window.EventSource) {
+            pollLog();
+            return;
+        }
+
+        logEvents = new EventSource(`/logs/stream?cursor=${encodeURIComponent(logCursor)}`);
+        logEvents.onmessage = (event) => {
+            const data = JSON.parse(event.data);
+            logCursor = event.lastEventId;
+            appendLog(data.text, data.reset);
+        };
+        logEvents.addEventListener("idle", () => {
+            stopFollowing();
+            pollLog();
+        });
+        logEvents.onerror = () => {
+            stopFollowing();
+            pollLog();
+        };
+    }
+
+    // Toggle visibility of logs, and follow the latest log while they are shown
     logsButton.addEventListener("click", () => {
         logsSection.classList.toggle("open");
 
         if (logsSection.classList.contains("open")) {
             logsSection.style.display = "block";
+            logCursor = null;
 
-            // Fetch the latest logs whenever the section is opened
-            fetch("/logs/recent")
-                .then((response) => {
-                    if (!response.ok) {
-                        throw new Error("Failed to fetch logs.");
-                    }
-                    return response.text();
-                })
-                .then((data) => {
-                    logContent.textContent = data;
-                })
+            fetchLog()
+                .then(() => resumeLog(true))
                 .catch((error) => {
                     console.error("Error fetching logs:", error);
                     logContent.textContent = "Unable to load logs.";
                 });
         } else {
             logsSection.style.display = "none";
+            stopFollowing();
         }
     });
 });
@@ -266,68 +361,152 @@ function submitForm(event) {
         spinnerElement.style.display = "block";
     }
 
+    const progressElement = document.getElementById("scan-progress");
+    if (progressElement) {
+        progressElement.textContent = "";
+    }
+
     // Gather form data
     const formData = new FormData(event.target);
 
-    // Send POST request to /new_releases
+    // Send POST request to /new_releases, the scan runs as a background job
     fetch("/new_releases", {
         method: "POST",
         body: formData,
     })
         .then(response => response.json())
         .then(data => {
-            if (spinnerElement) {
-                spinnerElement.style.display = "none";
-            }
-
-            if (data.error && errorMessageElement) {
-                errorMessageElement.textContent = data.error;
-                errorMessageElement.style.display = "block";
+            if (data.error) {
+                showScanError(data.error);
                 return;
             }
+            followScanJob(data.job_id);
+        })
+        .catch(error => {
+            console.error("Error:", error);
+            showScanError("An unexpected error occurred.");
+        });
+}
 
-            if (data.results) {
-                // Process movies
-                if (data.results.movies && data.results.movies.length > 0) {
-                    data.results.movies.forEach(movie => {
-                        const li = document.createElement("li");
-                        li.textContent = movie;
-                        resultsMoviesElement.appendChild(li);
-                    });
-                } else {
-                    const li = document.createElement("li");
-                    li.textContent = "No movies linked.";
-                    resultsMoviesElement.appendChild(li);
-                }
+// Follow a scan job's progress until it finishes, then render its results
+function followScanJob(jobId) {
+    const progressElement = document.getElementById("scan-progress");
 
-                // Process shows
-                if (data.results.shows && data.results.shows.length > 0) {
-                    data.results.shows.forEach(show => {
-                        const li = document.createElement("li");
-                        li.textContent = show;
-                        resultsShowsElement.appendChild(li);
-                    });
-                } else {
-                    const li = document.createElement("li");
-                    li.textContent = "No shows linked.";
-                    resultsShowsElement.appendChild(li);
-                }
+    const onUpdate = job => {
+        if (progressElement) {
+            progressElement.textContent = `Phase: ${job.phase} | Scanned: ${job.items_scanned} | Linked: ${job.items_linked} | ${Math.round(job.elapsed)}s`;
+        }
+        if (job.state === "completed") {
+            renderResults(job.result);
+            return true;
+        }
+        if (job.state === "failed") {
+            showScanError(job.error || "The scan failed, check the logs.");
+            return true;
+        }
+        return false;
+    };
 
-                // Show the results box
-                if (resultsElement) {
-                    resultsElement.style.display = "block";
+    // Poll the job status if the browser can't keep an event stream open
+    const poll = () => {
+        fetch(`/jobs/${jobId}`)
+            .then(response => response.json())
+            .then(job => {
+                if (job.error && !job.state) {
+                    showScanError(job.error);
+                } else if (!onUpdate(job)) {
+                    setTimeout(poll, 2000);
                 }
+            })
+            .catch(() => setTimeout(poll, 5000));
+    };
+
+    if (!window.EventSource) {
+        poll();
+        return;
+    }
+
+    const events = new EventSource(`/jobs/${jobId}/events`);
+    events.onmessage = event => {
+        if (onUpdate(JSON.parse(event.data))) {
+            events.close();
+        }
+    };
+    events.onerror = () => {
+        events.close();
+        poll();
+    };
+}
+
+function showScanError(message) {
+    const errorMessageElement = document.getElementById("error-message");
+    const spinnerElement = document.getElementById("spinner");
+
+    if (spinnerElement) {
+        spinnerElement.style.display = "none";
+    }
+    if (errorMessageElement) {
+        errorMessageElement.textContent = message;
+        errorMessageElement.style.display = "block";
+    }
+}
+
+const RESULTS_PAGE_SIZE = 200; // Linked items fetched per request while rendering results
+
+function renderResults(data) {
+    const resultsElement = document.getElementById("results");
+    const resultsMoviesElement = document.getElementById("results-movies");
+    const resultsShowsElement = document.getElementById("results-shows");
+    const spinnerElement = document.getElementById("spinner");
+
+    if (spinnerElement) {
+        spinnerElement.style.display = "none";
+    }
+
+    if (data && data.results) {
+        // Render each list page by page, so long results show up progressively
+        renderResultPages(data.results.url, "movies", resultsMoviesElement, "No movies linked.");
+        renderResultPages(data.results.url, "shows", resultsShowsElement, "No shows linked.");
+
+        // Show the results box
+        if (resultsElement) {
+            resultsElement.style.display = "block";
+        }
+    }
+}
+
+function renderResultPages(url, mediaType, listElement, emptyMessage, offset = 0) {
+    fetch(`${url}?media_type=${mediaType}&offset=${offset}&limit=${RESULTS_PAGE_SIZE}`)
+        .then(response => response.json())
+        .then(page => {
+            if (page.error) {
+                throw new Error(page.error);
             }
-        })
-        .catch(error => {
-            console.error("Error:", error);
-            if (spinnerElement) {
-                spinnerElement.style.display = "none";
+            if (page.total === 0) {
+                const li = document.createElement("li");
+                li.textContent = emptyMessage;
+                listElement.appendChild(li);
+                return;
             }
-            if (errorMessageElement) {
-                errorMessageElement.textContent = "An unexpected error occurred.";
-                errorMessageElement.style.display = "block";
+
+            const fragment = document.createDocumentFragment();
+            page.items.forEach(item => {
+                const li = document.createElement("li");
+                li.textContent = item.title;
+                li.title = `${item.date} - ${item.source}`;
+                fragment.appendChild(li);
+            });
+            listElement.appendChild(fragment);
+
+            if (page.next_offset !== null) {
+                renderResultPages(url, mediaType, listElement, emptyMessage, page.next_offset);
             }
+        })
+        .catch(error => {
+            console.error("Error fetching results:", error);
+            const li = document.createElement("li");
+            li.textContent = "Unable to load results.";
+            listElement.appendChild(li);
         });
 }
 window.onload = function() {
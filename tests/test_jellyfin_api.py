@@ -0,0 +1,117 @@
+import os
+import sys
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jellyfin_api import refresh_changed_libraries, library_for_folder
+
+VIRTUAL_FOLDERS = [
+    {"Name": "Media", "ItemId": "media", "Locations": ["/data/media"]},
+    {"Name": "New Movies", "ItemId": "movies", "Locations": ["/data/media/SpotlightMovies"]},
+    {"Name": "New Releases", "ItemId": "both", "Locations": ["/spot/both", "/spot/both2/"]},
+]
+
+
+class MockJellyfin(BaseHTTPRequestHandler):
+    """Serves /Library/VirtualFolders and /Items/{id}/Refresh, failing refreshes of server.failing ids."""
+
+    def do_GET(self):
+        self.server.requests.append(('GET', self.path, self.headers.get('Authorization')))
+        if self.path != '/Library/VirtualFolders':
+            self.send_error(404)
+            return
+        body = json.dumps(VIRTUAL_FOLDERS).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.server.requests.append(('POST', self.path.split('?')[0], self.headers.get('Authorization')))
+        item_id = self.path.split('/')[2]
+        self.send_response(500 if item_id in self.server.failing else 204)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class RefreshChangedLibrariesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), MockJellyfin)
+        self.server.requests = []
+        self.server.failing = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.options = {'url': f'http://127.0.0.1:{self.server.server_port}/', 'api_key': 'secret', 'timeout': 5}
+
+    def refreshes(self):
+        return [path for method, path, _ in self.server.requests if method == 'POST']
+
+    def test_refreshes_each_changed_library_once(self):
+        status = refresh_changed_libraries(self.options, {
+            '/data/media/SpotlightMovies': {'added': 2, 'removed': 0},
+            '/spot/both': {'added': 0, 'removed': 1},
+            '/spot/both2': {'added': 1, 'removed': 1},
+            '/spot/shows': {'added': 0, 'removed': 0},
+            '/elsewhere': {'added': 1, 'removed': 0},
+        })
+        self.assertEqual(sorted(self.refreshes()), ['/Items/both/Refresh', '/Items/movies/Refresh'])
+        self.assertEqual(status, {
+            '/data/media/SpotlightMovies': 'refreshed',
+            '/spot/both': 'refreshed',
+            '/spot/both2': 'refreshed',
+            '/spot/shows': 'unchanged',
+            '/elsewhere': 'not_found',
+        })
+        self.assertTrue(all('Token="secret"' in auth for _, _, auth in self.server.requests))
+
+    def test_no_request_when_nothing_changed(self):
+        status = refresh_changed_libraries(self.options, {'/spot/both': {'added': 0, 'removed': 0}})
+        self.assertEqual(status, {'/spot/both': 'unchanged'})
+        self.assertEqual(self.server.requests, [])
+
+    def test_failures_are_swallowed(self):
+        self.server.failing.add('both')
+        status = refresh_changed_libraries(self.options, {
+            '/spot/both': {'added': 1, 'removed': 0},
+            '/data/media/SpotlightMovies': {'added': 1, 'removed': 0},
+        })
+        self.assertEqual(status, {'/spot/both': 'failed', '/data/media/SpotlightMovies': 'refreshed'})
+
+        unreachable = dict(self.options, url='http://127.0.0.1:1')
+        status = refresh_changed_libraries(unreachable, {'/spot/both': {'added': 1, 'removed': 0}})
+        self.assertEqual(status, {'/spot/both': 'failed'})
+
+    def test_not_configured(self):
+        self.assertEqual(refresh_changed_libraries({}, {'/spot/both': {'added': 1, 'removed': 0}}), {})
+        self.assertEqual(self.server.requests, [])
+
+
+class LibraryForFolderTest(unittest.TestCase):
+
+    def test_exact_location_beats_a_shared_parent(self):
+        # The shared parent library is listed first, as in the README's Docker layout
+        library = library_for_folder(VIRTUAL_FOLDERS, '/data/media/SpotlightMovies/')
+        self.assertEqual(library['ItemId'], 'movies')
+
+    def test_longest_containing_location_wins(self):
+        folders = VIRTUAL_FOLDERS + [{"Name": "Deep", "ItemId": "deep", "Locations": ["/data/media/Spotlight"]}]
+        self.assertEqual(library_for_folder(folders, '/data/media/Spotlight/Movies')['ItemId'], 'deep')
+        self.assertEqual(library_for_folder(folders, '/data/media/Other')['ItemId'], 'media')
+
+    def test_location_inside_the_folder(self):
+        self.assertEqual(library_for_folder(VIRTUAL_FOLDERS, '/spot')['ItemId'], 'both')
+        self.assertIsNone(library_for_folder(VIRTUAL_FOLDERS, '/nowhere'))
+
+
+if __name__ == '__main__':
+    unittest.main()
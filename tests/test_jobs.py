@@ -0,0 +1,69 @@
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jobs import JobManager, job_key, process_start
+
+
+class JobManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.jobs_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.jobs_dir)
+        self.manager = JobManager(self.jobs_dir)
+        self.key = job_key(["/media/Movies"])
+
+    def leftover(self, job_id, **fields):
+        record = {"id": job_id, "key": self.key, "state": "running", "finished_at": None}
+        record.update(fields)
+        self.manager.write(record)
+
+    def submit_blocking(self):
+        release = threading.Event()
+
+        def finish():
+            release.set()
+            for thread in threading.enumerate():
+                if thread.name.startswith('scan-job-'):
+                    thread.join()
+        self.addCleanup(finish)
+        return self.manager.submit(self.key, lambda job: release.wait(10))
+
+    def test_identical_submissions_merge_into_the_running_job(self):
+        job_id, merged = self.submit_blocking()
+        self.assertFalse(merged)
+        self.assertEqual(self.manager.submit(self.key, lambda job: None), (job_id, True))
+
+    def test_record_of_a_recycled_pid_is_stale(self):
+        # PID 1 after a container restart, started at another time than when the record was written
+        started = process_start(1)
+        self.leftover('abc', pid=1, pid_started=None if started is None else started + 1)
+        self.leftover('abd', pid=1)
+        job_id, merged = self.submit_blocking()
+        self.assertFalse(merged)
+        self.assertNotIn(job_id, ('abc', 'abd'))
+        for stale in ('abc', 'abd'):
+            self.assertEqual(self.manager.get(stale)['state'], 'failed')
+
+    def test_record_of_this_process_not_running_here_is_stale(self):
+        self.leftover('abc', pid=os.getpid(), pid_started=process_start(os.getpid()))
+        job_id, merged = self.submit_blocking()
+        self.assertFalse(merged)
+        self.assertEqual(self.manager.get('abc')['state'], 'failed')
+
+    def test_job_of_another_live_process_is_joined(self):
+        pid = os.getppid()
+        if process_start(pid) is None:
+            self.skipTest("Process start times need /proc")
+        self.leftover('abc', pid=pid, pid_started=process_start(pid))
+        self.assertEqual(self.manager.submit(self.key, lambda job: None), ('abc', True))
+        self.assertEqual(self.manager.get('abc')['state'], 'running')
+
+
+if __name__ == '__main__':
+    unittest.main()
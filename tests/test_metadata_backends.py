@@ -0,0 +1,103 @@
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metadata_backends
+from metadata_backends import (
+    open_metadata_backend, item_table, MOVIE_TYPE, SERIES_TYPE, SEASON_TYPE, EPISODE_TYPE
+)
+from movie_processor import scan_movies
+from show_processor import scan_shows
+from scanner import LibraryScanner
+
+
+def write(path, text=''):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+class JellyfinDatabaseTest(unittest.TestCase):
+    """A small BaseItems database in a file not named jellyfin.db, next to a library it partly covers."""
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base)
+        metadata_backends._cache.clear()
+
+        self.recent = (datetime.now() - timedelta(days=5)).strftime('%Y-%m-%d')
+        self.movies = os.path.join(self.base, 'Movies')
+        self.shows = os.path.join(self.base, 'Shows')
+
+        # Known to the database only: no NFO at all, the show has no tvshow.nfo either
+        write(os.path.join(self.movies, 'Known (2024)', 'Known.mkv'))
+        self.show = os.path.join(self.shows, 'Series')
+        self.season = os.path.join(self.show, 'Season 01')
+        self.episode = os.path.join(self.season, 'S01E01.mkv')
+        write(self.episode)
+        # Not in the database, read from its NFO
+        write(os.path.join(self.movies, 'Unknown (2024)', 'Unknown.mkv'))
+        write(os.path.join(self.movies, 'Unknown (2024)', 'Unknown.nfo'),
+              f'<movie><title>Unknown</title><releasedate>{self.recent}</releasedate></movie>')
+
+        self.db_path = os.path.join(self.base, 'fixture.db')
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('CREATE TABLE BaseItems (Type, Path, Name, PremiereDate, DateCreated, IndexNumber)')
+        premiere = f'{self.recent} 00:00:00'
+        conn.executemany('INSERT INTO BaseItems VALUES (?, ?, ?, ?, ?, ?)', [
+            (MOVIE_TYPE, os.path.join(self.movies, 'Known (2024)', 'Known.mkv'), 'Known', premiere, premiere, None),
+            (SERIES_TYPE, self.show, 'The Series', None, premiere, None),
+            (SEASON_TYPE, self.season, 'Season 1', None, premiere, 1),
+            (EPISODE_TYPE, self.episode, 'Pilot', premiere, premiere, 1),
+        ])
+        conn.commit()
+        conn.close()
+        self.options = {'backend': 'jellyfin', 'database': self.db_path}
+
+    def test_table_is_probed_not_guessed_from_the_file_name(self):
+        self.assertEqual(item_table(self.db_path), 'BaseItems')
+        self.assertIsNotNone(open_metadata_backend(self.options, self.base))
+
+    def test_lookup_and_is_show(self):
+        metadata = open_metadata_backend(self.options, self.base)
+        movie = metadata.lookup(os.path.join(self.movies, 'Known (2024)', 'Known.mkv'), ('title', 'releasedate', 'year'))
+        self.assertEqual(movie, {'title': 'Known', 'releasedate': self.recent, 'year': self.recent[:4]})
+        self.assertEqual(metadata.lookup(self.season, ('seasonnumber',)), {'seasonnumber': '1'})
+        self.assertEqual(metadata.lookup(self.episode, ('aired',)), {'aired': self.recent})
+        self.assertIsNone(metadata.lookup(os.path.join(self.movies, 'Unknown (2024)', 'Unknown.mkv'), ('title',)))
+        self.assertTrue(metadata.is_show(self.show))
+        self.assertFalse(metadata.is_show(self.season))
+
+    def test_scan_falls_back_to_nfo_for_unknown_items(self):
+        metadata = open_metadata_backend(self.options, self.base)
+        spotlight = os.path.join(self.base, 'Spotlight')
+        linked = scan_movies(self.movies, [(spotlight, timedelta(days=30))], scanner=LibraryScanner(metadata=metadata))
+        self.assertEqual(sorted(movie['title'] for movie in linked[spotlight]), ['Known', 'Unknown'])
+
+        linked = scan_shows(self.shows, [(spotlight, timedelta(days=30))], scanner=LibraryScanner(metadata=metadata))
+        self.assertEqual([season['title'] for season in linked[spotlight]], ['The Series - Season 1'])
+
+    def test_loaded_database_is_reused_until_it_changes(self):
+        first = open_metadata_backend(self.options, self.base)
+        self.assertIs(open_metadata_backend(self.options, self.base), first)
+
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('INSERT INTO BaseItems VALUES (?, ?, ?, ?, ?, ?)',
+                     (MOVIE_TYPE, os.path.join(self.movies, 'New.mkv'), 'New', None, None, None))
+        conn.commit()
+        conn.close()
+        os.utime(self.db_path, ns=(0, os.stat(self.db_path).st_mtime_ns + 1))
+
+        reloaded = open_metadata_backend(self.options, self.base)
+        self.assertIsNot(reloaded, first)
+        self.assertEqual(reloaded.lookup(os.path.join(self.movies, 'New.mkv'), ('title',)), {'title': 'New'})
+
+
+if __name__ == '__main__':
+    unittest.main()
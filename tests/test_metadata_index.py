@@ -0,0 +1,76 @@
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metadata_index import MetadataIndex
+
+
+class QuickIndex(MetadataIndex):
+    COMMIT_EVERY = 3
+    BUSY_TIMEOUT = 0.1
+
+
+class MetadataIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base)
+        self.db_path = os.path.join(self.base, 'index.db')
+        self.nfos = []
+        for i in range(5):
+            path = os.path.join(self.base, f'movie{i}.nfo')
+            with open(path, 'w') as f:
+                f.write(f'<movie><title>Movie {i}</title></movie>')
+            self.nfos.append(path)
+
+    def lookup(self, index, path):
+        return index.lookup_stat(path, os.stat(path), ('title',))
+
+    def test_cached_after_close(self):
+        index = QuickIndex(self.db_path)
+        self.assertEqual(self.lookup(index, self.nfos[0]), ({'title': 'Movie 0'}, True))
+        self.assertEqual(self.lookup(index, self.nfos[0]), ({'title': 'Movie 0'}, False))
+        index.close()
+
+        index = QuickIndex(self.db_path)
+        self.assertEqual(self.lookup(index, self.nfos[0]), ({'title': 'Movie 0'}, False))
+        index.close()
+
+    def test_parsing_scan_doesnt_hold_the_write_lock(self):
+        first = QuickIndex(self.db_path)
+        self.addCleanup(first.close)
+        self.lookup(first, self.nfos[0])  # Buffered, the first scan is still running
+
+        second = QuickIndex(self.db_path)
+        for path in self.nfos:
+            self.assertTrue(self.lookup(second, path)[1])  # Flushes a batch on its own
+        second.close()
+
+    def test_locked_database_falls_back_to_parsing(self):
+        index = QuickIndex(self.db_path)
+        blocker = sqlite3.connect(self.db_path)
+        blocker.execute('BEGIN EXCLUSIVE')
+        try:
+            for i, path in enumerate(self.nfos):
+                self.assertEqual(self.lookup(index, path), ({'title': f'Movie {i}'}, True))
+            self.assertIsNone(index.get_listing(self.base, 1))
+            index.put_listing(self.base, 1, {'dirs': {}, 'files': []})
+            self.assertEqual(index.prune(self.base), 0)
+        finally:
+            blocker.rollback()
+            blocker.close()
+        index.close()  # Stores what the locked batches couldn't
+
+        index = QuickIndex(self.db_path)
+        self.assertFalse(self.lookup(index, self.nfos[0])[1])
+        self.assertEqual(index.get_listing(self.base, 1), {'dirs': {}, 'files': []})
+        index.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
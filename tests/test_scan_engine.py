@@ -0,0 +1,122 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scan_engine import run_scan, run_incremental_scan
+from benchmarks.generate import generate_library
+from benchmarks.latency import filesystem_latency
+from benchmarks.run import build_libraries
+
+PERIOD = 90 * 24 * 3600
+BACKDATED = datetime.now().timestamp() - 3600
+
+
+def write(path, text=''):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def tree(root):
+    """Return every folder and link under a folder, links with their targets."""
+    entries = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            path = os.path.join(dirpath, name)
+            entries[os.path.relpath(path, root)] = os.readlink(path) if os.path.islink(path) else None
+    return entries
+
+
+def backdate(root):
+    """Age a tree past the index's racy window, so its listings are cached."""
+    for dirpath, _, filenames in os.walk(root, topdown=False):
+        for name in filenames:
+            os.utime(os.path.join(dirpath, name), (BACKDATED, BACKDATED))
+        os.utime(dirpath, (BACKDATED, BACKDATED))
+
+
+class IncrementalScanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base)
+        self.movies = os.path.join(self.base, 'Movies')
+        self.spotlight = os.path.join(self.base, 'Spotlight')
+        self.index_file = os.path.join(self.base, 'state', 'index.db')
+        os.makedirs(self.spotlight)
+        self.libraries = [{'media_type': 'movies', 'time_period': PERIOD,
+                           'media_path': self.movies, 'new_releases_folder': self.spotlight}]
+        self.folder = os.path.join(self.movies, 'Late (2024)')
+        write(os.path.join(self.folder, 'Late.mkv'))
+        backdate(self.movies)
+        run_scan(self.libraries, self.index_file)
+
+        # The NFO shows up on storage that doesn't update folder mtimes
+        recent = (datetime.now() - timedelta(days=3)).strftime('%Y-%m-%d')
+        write(os.path.join(self.folder, 'Late.nfo'), f'<movie><title>Late</title><releasedate>{recent}</releasedate></movie>')
+        os.utime(self.folder, (BACKDATED, BACKDATED))
+        self.units = {('movies', self.movies): {(self.folder, self.folder, None)}}
+
+    def test_cached_listing_is_reused_by_default(self):
+        changes = run_incremental_scan(self.libraries, self.units, self.index_file)
+        self.assertEqual(changes, {self.spotlight: {'added': 0, 'removed': 0}})
+
+    def test_directory_snapshot_disabled(self):
+        changes = run_incremental_scan(self.libraries, self.units, self.index_file,
+                                       scan_options={'directory_snapshot': False})
+        self.assertEqual(changes, {self.spotlight: {'added': 1, 'removed': 0}})
+        self.assertTrue(os.path.islink(os.path.join(self.spotlight, 'Late', 'Late.mkv')))
+
+
+
+class RemoteModeTest(unittest.TestCase):
+    """Remote mode on a mount with a round-trip per call must link exactly what local mode does."""
+
+    LATENCY = 0.001
+
+    @classmethod
+    def setUpClass(cls):
+        cls.base = tempfile.mkdtemp()
+        cls.layout = generate_library(cls.base, items=240, seed=3)
+        cls.libraries = build_libraries(cls.layout)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.base)
+
+    def scan(self, io_mode):
+        # Start from the same spotlight folders every time: one stale link, one obsolete folder
+        movies_spotlight = self.layout['spotlight']['movies']
+        for folder in self.layout['spotlight'].values():
+            shutil.rmtree(folder, ignore_errors=True)
+            os.makedirs(folder)
+        os.makedirs(os.path.join(movies_spotlight, 'Gone'))
+        os.symlink('/nowhere/Gone.mkv', os.path.join(movies_spotlight, 'Gone', 'Gone.mkv'))
+
+        roots = [self.layout['movies_path'], self.layout['shows_path'], *self.layout['spotlight'].values()]
+        with filesystem_latency(roots, self.LATENCY):
+            scan = run_scan(self.libraries, scan_options={'io_mode': io_mode, 'io_workers': 8})
+        spotlight = {media_type: tree(folder) for media_type, folder in self.layout['spotlight'].items()}
+        linked = {media_type: sorted(scan[media_type], key=lambda item: item['link']) for media_type in ('movies', 'shows')}
+        return scan['changes'], linked, spotlight
+
+    def test_remote_mode_matches_local_mode(self):
+        local = self.scan('local')
+        remote = self.scan('remote')
+
+        changes, linked, spotlight = local
+        self.assertTrue(linked['movies'] and linked['shows'])
+        self.assertEqual(changes[self.layout['spotlight']['movies']]['removed'], 1)
+        self.assertNotIn('Gone', spotlight['movies'])
+        self.assertEqual(remote[0], changes)
+        self.assertEqual(remote[1], linked)
+        self.assertEqual(remote[2], spotlight)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+import os
+import io
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils
+from utils import extract_nfo_tags, reconcile_new_releases_folder
+
+
+def write(path, text=''):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def write_bytes(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def link(target, link_path):
+    os.makedirs(os.path.dirname(link_path), exist_ok=True)
+    os.symlink(target, link_path)
+
+
+def tree(root):
+    """Return every file, folder and link under a folder, links with their targets."""
+    entries = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, root)
+            if os.path.islink(path):
+                entries[rel] = '-> ' + os.readlink(path)
+            elif os.path.isdir(path):
+                entries[rel] = 'dir'
+            else:
+                entries[rel] = 'file'
+    return entries
+
+
+class ExtractNfoTagsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base)
+        self.nfo = os.path.join(self.base, 'movie.nfo')
+
+    def test_bom_and_declaration(self):
+        write_bytes(self.nfo, b'\xef\xbb\xbf\n<?xml version="1.0" encoding="utf-8"?>\n'
+                              b'<movie><title>Am\xc3\xa9lie</title><releasedate>2001-04-25</releasedate></movie>')
+        self.assertEqual(extract_nfo_tags(self.nfo, ('title', 'releasedate')),
+                         {'title': 'Amélie', 'releasedate': '2001-04-25'})
+
+    def test_malformed_falls_back_to_text_scan(self):
+        # The bare ampersand breaks the XML before the title is reached
+        write(self.nfo, '<movie><plot>Cats & dogs</plot><title> Tom &amp; Jerry </title>'
+                        '<year>2021</year></movie>\nhttps://www.imdb.com/title/tt1361336/')
+        with self.assertLogs(level='WARNING'):
+            values = extract_nfo_tags(self.nfo, ('title', 'year', 'premiered'))
+        self.assertEqual(values, {'title': 'Tom & Jerry', 'year': '2021', 'premiered': None})
+
+    def test_trailing_junk_after_the_found_tags(self):
+        write(self.nfo, '<movie><title>Tom &amp; Jerry</title></movie>\nhttps://www.imdb.com/title/tt1361336/')
+        self.assertEqual(extract_nfo_tags(self.nfo, ('title',)), {'title': 'Tom & Jerry'})
+
+    def test_stops_reading_once_every_tag_is_found(self):
+        actors = ''.join(f'<actor><name>Actor {i}</name></actor>' for i in range(2000))
+        write(self.nfo, f'<movie><title>Early</title><year>2020</year>{actors}<plot>&broken</movie>')
+        self.assertGreater(os.path.getsize(self.nfo), 4 * utils.NFO_CHUNK_SIZE)
+        read = []
+
+        class CountingFile(io.FileIO):
+            def read(self, size=-1):
+                data = super().read(size)
+                read.append(len(data))
+                return data
+
+        with mock.patch.object(utils, 'open', create=True, side_effect=lambda path, mode: CountingFile(path)):
+            self.assertEqual(extract_nfo_tags(self.nfo, ('title', 'year')), {'title': 'Early', 'year': '2020'})
+        self.assertEqual(read, [utils.NFO_CHUNK_SIZE])  # The broken end was never read
+
+    def test_nested_tags_with_the_same_name_are_ignored(self):
+        write(self.nfo, '<movie><set><title>The Collection</title></set>'
+                        '<actor><name>Someone</name><title>Role</title></actor>'
+                        '<title>The Movie</title><name>Top</name></movie>')
+        self.assertEqual(extract_nfo_tags(self.nfo, ('title', 'name')), {'title': 'The Movie', 'name': 'Top'})
+
+    def test_missing_and_empty_tags(self):
+        write(self.nfo, '<movie><title>  </title></movie>')
+        self.assertEqual(extract_nfo_tags(self.nfo, ('title', 'year')), {'title': None, 'year': None})
+        with self.assertLogs(level='ERROR'):
+            values = extract_nfo_tags(os.path.join(self.base, 'missing.nfo'), ('title',))
+        self.assertEqual(values, {'title': None})
+
+
+class ReconcileTest(unittest.TestCase):
+    """A spotlight folder holding current, stale and foreign entries next to a movies library."""
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base)
+        self.movies = os.path.join(self.base, 'Movies')
+        self.spotlight = os.path.join(self.base, 'Spotlight')
+        for name in ('A', 'B', 'C', 'Old'):
+            write(self.media(name))
+
+        link(self.media('A'), self.spot('A'))
+        write(os.path.join(self.spotlight, 'A', 'poster.jpg'))  # Saved by Jellyfin next to a kept link
+        link(self.media('Old'), os.path.join(self.spotlight, 'A', 'Old.mkv'))
+        link(self.media('C'), self.spot('C'))
+        write(os.path.join(self.spotlight, 'C', 'poster.jpg'))
+
+    def media(self, name):
+        return os.path.join(self.movies, name, f'{name}.mkv')
+
+    def spot(self, name):
+        return os.path.join(self.spotlight, name, f'{name}.mkv')
+
+    def test_full_reconcile(self):
+        desired = {self.spot('A'): self.media('A'), self.spot('B'): self.media('B')}
+        changes = reconcile_new_releases_folder(self.spotlight, desired)
+
+        self.assertEqual(changes, {
+            'add': {self.spot('B'): self.media('B')},
+            'remove': [os.path.join(self.spotlight, 'A', 'Old.mkv')],
+            'remove_dirs': [os.path.join(self.spotlight, 'C')],
+        })
+        self.assertEqual(tree(self.spotlight), {
+            'A': 'dir',
+            'A/A.mkv': '-> ' + self.media('A'),
+            'A/poster.jpg': 'file',
+            'B': 'dir',
+            'B/B.mkv': '-> ' + self.media('B'),
+        })
+
+    def test_scoped_reconcile(self):
+        # C's folder also holds a link out of scope, A's only in-scope links
+        link(self.media('B'), os.path.join(self.spotlight, 'C', 'B.mkv'))
+        scope = [os.path.join(self.movies, 'A'), os.path.join(self.movies, 'C'), os.path.join(self.movies, 'Old')]
+        changes = reconcile_new_releases_folder(self.spotlight, {}, scope=scope)
+
+        self.assertEqual(changes, {
+            'add': {},
+            'remove': [self.spot('C')],
+            'remove_dirs': [os.path.join(self.spotlight, 'A')],
+        })
+        self.assertEqual(tree(self.spotlight), {
+            'C': 'dir',
+            'C/B.mkv': '-> ' + self.media('B'),
+            'C/poster.jpg': 'file',
+        })
+
+    def test_scope_keeps_links_outside_it(self):
+        scope = [os.path.join(self.movies, 'B')]
+        before = tree(self.spotlight)
+        changes = reconcile_new_releases_folder(self.spotlight, {self.spot('B'): self.media('B')}, scope=scope)
+
+        self.assertEqual(changes, {'add': {self.spot('B'): self.media('B')}, 'remove': [], 'remove_dirs': []})
+        self.assertEqual(tree(self.spotlight), dict(before, **{'B': 'dir', 'B/B.mkv': '-> ' + self.media('B')}))
+
+    def test_dry_run_leaves_the_disk_alone(self):
+        before = tree(self.spotlight)
+        changes = reconcile_new_releases_folder(self.spotlight, {self.spot('B'): self.media('B')}, dry_run=True)
+
+        self.assertEqual(changes['add'], {self.spot('B'): self.media('B')})
+        self.assertEqual(sorted(changes['remove_dirs']), [os.path.join(self.spotlight, 'A'), os.path.join(self.spotlight, 'C')])
+        self.assertEqual(tree(self.spotlight), before)
+
+    def test_links_into_the_spotlight_folder_are_refused(self):
+        # Directly, and through a media folder that is a link to the spotlight folder
+        os.symlink(self.spotlight, os.path.join(self.movies, 'Alias'))
+        inside = os.path.join(self.spotlight, 'A', 'A.mkv')
+        through_alias = os.path.join(self.movies, 'Alias', 'C', 'C.mkv')
+        desired = {
+            self.spot('A'): self.media('A'),
+            os.path.join(self.spotlight, 'Loop', 'Loop.mkv'): inside,
+            os.path.join(self.spotlight, 'Alias', 'C.mkv'): through_alias,
+        }
+        with self.assertLogs(level='ERROR') as logs:
+            changes = reconcile_new_releases_folder(self.spotlight, desired)
+
+        self.assertEqual(len(logs.output), 2)
+        self.assertEqual(changes['add'], {})
+        self.assertNotIn('Loop', tree(self.spotlight))
+        self.assertNotIn('Alias', tree(self.spotlight))
+        self.assertEqual(os.readlink(self.spot('A')), self.media('A'))  # The media it would have replaced
+
+
+if __name__ == '__main__':
+    unittest.main()
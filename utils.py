@@ -2,72 +2,131 @@ import os
 import xml.etree.ElementTree as ET
 import logging
 import shutil
+import codecs
+import html
+import re
+import fcntl
+import heapq
+from contextlib import contextmanager
+from library_discovery import discover_libraries
 
 
-def get_jellyfin_media_paths(base_config_path):
+def paths_overlap(path, other):
+    """Return whether two folders are the same, or one lies inside the other, after resolving symlinks."""
+    path, other = os.path.realpath(path), os.path.realpath(other)
+    return path == other or path.startswith(os.path.join(other, '')) or other.startswith(os.path.join(path, ''))
+
+
+def get_jellyfin_media_paths(base_config_path, exclude=()):
     """
-    Parse Jellyfin's configuration files to dynamically retrieve media library paths.
-    
+    Retrieve the media paths of every movie and show library in Jellyfin's configuration.
+
     Args:
         base_config_path (str): Base path to the Jellyfin configuration, e.g., /var/lib/jellyfin/root/default/
+        exclude (iterable, optional): Spotlight folders. Their own Jellyfin libraries, and any
+            path containing or inside them, are left out so a spotlight never feeds itself.
 
     Returns:
         dict: A dictionary with keys 'movies' and 'shows', containing lists of paths.
     """
+    exclude = list(exclude)
     media_paths = {"movies": [], "shows": []}
-
-    # Define the directories to look for options.xml
-    categories = {"movies": "Movies", "shows": "Shows"}
-    for category, subfolder in categories.items():
-        options_file = os.path.join(base_config_path, subfolder, "options.xml")
-
-        if not os.path.exists(options_file):
-            logging.warning(f"Missing options.xml for {category}: {options_file}")
-            continue
-
-        try:
-            tree = ET.parse(options_file)
-            root = tree.getroot()
-
-            # Extract all paths under <PathInfos>/<MediaPathInfo>/<Path>
-            for path_element in root.findall(".//PathInfos/MediaPathInfo/Path"):
-                if path_element.text:
-                    media_paths[category].append(path_element.text)
-                    logging.info(f"Found {category} path: {path_element.text}")
-        except (ET.ParseError, FileNotFoundError) as e:
-            logging.error(f"Error reading {options_file}: {e}")
-
+    for library in discover_libraries(base_config_path):
+        for path in library.paths:
+            if any(paths_overlap(path, folder) for folder in exclude):
+                logging.info(f"Skipping {path} of library {library.name}, it overlaps a spotlight folder")
+                continue
+            if path not in media_paths[library.media_type]:
+                media_paths[library.media_type].append(path)
     return media_paths
 
-def parse_nfo(nfo_path, tag):
+NFO_CHUNK_SIZE = 16 * 1024
+
+def extract_nfo_tags(nfo_path, tags):
     """
-    Parse an .nfo file and extract the value of a specific XML tag.
+    Extract several top-level tags from an .nfo file in a single streaming pass.
+
+    Reading stops as soon as every requested tag has been found, so large cast,
+    art and fileinfo blocks after them are never read. BOM-prefixed files are
+    accepted, and files that are not well-formed XML (e.g., a trailing URL after
+    the root element) fall back to a tolerant text scan.
     
     Args:
         nfo_path (str): Path to the .nfo file.
-        tag (str): The XML tag to search for (e.g., 'title', 'releasedate').
+        tags (iterable): The XML tags to extract (e.g., {'title', 'releasedate', 'premiered'}).
     
     Returns:
-        str: The text content of the specified tag, or None if not found.
+        dict: Tag name to stripped text content (None when a tag is not found or empty).
     """
+    wanted = set(tags)
+    found = {}
+    consumed = []  # Raw bytes read so far, kept for the fallback scan
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    depth = 0
+
     try:
-        # Parse the .nfo file as XML
-        tree = ET.parse(nfo_path)
-        root = tree.getroot()
-
-        # Find the tag and return its text content
-        element = root.find(tag)
-        if element is not None:
-            return element.text.strip()
-        else:
-            logging.warning(f"Tag <{tag}> not found in {nfo_path}.")
-            return None
-    except ET.ParseError as e:
-        logging.error(f"Error parsing {nfo_path}: {e}")
-        return None
-    except FileNotFoundError:
-        logging.error(f".nfo file not found: {nfo_path}")
-        return None
+        with open(nfo_path, 'rb') as f:
+            first = True
+            while wanted - found.keys():
+                chunk = f.read(NFO_CHUNK_SIZE)
+                if not chunk:
+                    break
+                consumed.append(chunk)
+                if first:
+                    # Expat rejects a BOM or whitespace before the XML declaration
+                    chunk = chunk.lstrip(codecs.BOM_UTF8 + b' \t\r\n')
+                    first = False
+                try:
+                    # Parse errors surface here, after the events that preceded them
+                    parser.feed(chunk)
+                    for event, element in parser.read_events():
+                        if event == 'start':
+                            depth += 1
+                            continue
+                        depth -= 1
+                        if depth == 1:
+                            if element.tag in wanted and element.tag not in found:
+                                found[element.tag] = (element.text or '').strip() or None
+                            element.clear()  # Keep memory flat on large NFOs
+                except ET.ParseError as e:
+                    missing = wanted - found.keys()
+                    if missing:
+                        consumed.append(f.read())
+                        found.update(_scan_nfo_text(b''.join(consumed), missing))
+                        logging.warning(f"Recovered tags from malformed {nfo_path}: {e}")
+                    break
+    except OSError as e:
+        logging.error(f"Error reading {nfo_path}: {e}")
+
+    return {tag: found.get(tag) for tag in tags}
+
+def _scan_nfo_text(raw, tags):
+    """Find tags in NFO content that is not well-formed XML."""
+    text = raw.decode('utf-8', errors='replace')
+    values = {}
+    for tag in tags:
+        match = re.search(rf'<{re.escape(tag)}(?:\s[^>]*)?>(.*?)</{re.escape(tag)}\s*>', text, re.DOTALL)
+        if match:
+            values[tag] = html.unescape(match.group(1)).strip() or None
+    return values
+
+def keep_newest(heap, limit, key, value):
+    """
+    Keep the entries with the `limit` largest keys seen so far, e.g., the newest N release dates.
+
+    The heap never holds more than `limit` entries, whatever the number of
+    entries offered, and its smallest key is evicted first.
+
+    Args:
+        heap (list): Min-heap of (key, value) pairs, updated in place.
+        limit (int): Entries to keep.
+        key (tuple): Sort key, unique so values are never compared, e.g., (date, title, sequence).
+        value: Carried along with the key.
+    """
+    if len(heap) < limit:
+        heapq.heappush(heap, (key, value))
+    elif key > heap[0][0]:
+        heapq.heapreplace(heap, (key, value))
 
 def clean_new_releases_folder(folder_path):
     """
@@ -81,15 +140,287 @@ def clean_new_releases_folder(folder_path):
         return
 
     logging.info(f"Cleaning folder: {folder_path}")
+    removed = 0
     for item in os.listdir(folder_path):
         item_path = os.path.join(folder_path, item)
         try:
             if os.path.isdir(item_path):
                 shutil.rmtree(item_path)  # Remove directories
-                logging.info(f"Removed directory: {item_path}")
+                logging.debug("Removed directory: %s", item_path)
             else:
                 os.remove(item_path)  # Remove files
-                logging.info(f"Removed file: {item_path}")
+                logging.debug("Removed file: %s", item_path)
+            removed += 1
         except Exception as e:
             logging.error(f"Failed to remove {item_path}: {e}")
+    logging.info(f"Removed {removed} items from {folder_path}")
+
+
+def create_links(links, pool=None):
+    """
+    Create symbolic links that do not exist yet, along with their parent folders.
+    
+    Args:
+        links (dict): Link path to the media file it should point at.
+        pool (Executor, optional): I/O threads to create the links with, so their
+            round-trips overlap on network mounts.
+    
+    Returns:
+        int: Number of links created.
+    """
+    made_dirs = set()  # Parent folders already created, a season's episodes share one
+
+    def link(item):
+        link_path, target = item
+        parent = os.path.dirname(link_path)
+        try:
+            if parent not in made_dirs:
+                os.makedirs(parent, exist_ok=True)
+                made_dirs.add(parent)
+            os.symlink(target, link_path)
+            logging.debug("Linked %s to %s", target, link_path)
+            return 1
+        except FileExistsError:
+            return 0
+        except OSError as e:
+            logging.error(f"Failed to link {target} to {link_path}: {e}")
+            return 0
+
+    return sum(pool.map(link, links.items()) if pool is not None else map(link, links.items()))
+
+def _ancestors(path, folder_path):
+    """Yield the folders between a path and the spotlight folder, deepest first."""
+    parent = os.path.dirname(path)
+    while parent != folder_path and parent.startswith(folder_path):
+        yield parent
+        parent = os.path.dirname(parent)
+
+def _list_entries(path):
+    try:
+        with os.scandir(path) as it:
+            return list(it)
+    except OSError:
+        return []  # Like os.walk, skip folders that can't be listed
+
+def plan_link_changes(folder_path, desired, scope=None, pool=None):
+    """
+    Compare the desired links of a spotlight folder with what is on disk.
+
+    Folders that will no longer hold any desired link are removed as a whole
+    (including anything Jellyfin saved next to the links). Inside folders that
+    stay, only symbolic links are touched.
+    
+    Args:
+        folder_path (str): Path to the spotlight folder.
+        desired (dict): Link path to the media file it should point at.
+        scope (list, optional): Media paths that were rescanned. Only links pointing
+            inside them are candidates for removal, everything else is left alone.
+        pool (Executor, optional): I/O threads to list folders and read links with.
+    
+    Returns:
+        dict: 'add' (link path to target), 'remove' (stale links) and 'remove_dirs' (obsolete folders).
+    """
+    scope = [os.path.join(path, '') for path in scope] if scope is not None else None
+    keep_dirs = {folder_path}
+    for link_path in desired:
+        keep_dirs.update(_ancestors(link_path, folder_path))
+
+    add = dict(desired)
+    remove = []
+    remove_dirs = []
+    kept_links = []
+    run = pool.map if pool is not None else map
+
+    # Walk level by level from scandir entries, so link checks need no extra
+    # stat, and a level's listings and readlinks can be issued together
+    level = [folder_path]
+    while level:
+        next_level = []
+        link_paths = []
+        for entries in run(_list_entries, level):
+            for entry in entries:
+                if entry.is_symlink():
+                    link_paths.append(entry.path)  # Directory links are handled like any other link
+                elif not entry.is_dir():
+                    continue
+                elif scope is None and entry.path not in keep_dirs:
+                    remove_dirs.append(entry.path)
+                else:
+                    next_level.append(entry.path)
+
+        for link_path, target in zip(link_paths, run(os.readlink, link_paths)):
+            if desired.get(link_path) == target:
+                del add[link_path]  # Already in place
+            elif scope is None or link_path in desired or any(
+                os.path.join(target, '').startswith(path) for path in scope
+            ):
+                remove.append(link_path)
+            else:
+                kept_links.append(link_path)  # Outside the rescanned paths
+        level = next_level
+
+    if scope is not None:
+        # Drop folders whose links all go away, keep those still holding any link
+        for link_path in kept_links:
+            keep_dirs.update(_ancestors(link_path, folder_path))
+        emptied = set()
+        for link_path in remove:
+            emptied.update(d for d in _ancestors(link_path, folder_path) if d not in keep_dirs)
+        remove_dirs = sorted(d for d in emptied if os.path.dirname(d) not in emptied)
+        remove = [
+            link_path for link_path in remove
+            if not any(link_path.startswith(os.path.join(d, '')) for d in remove_dirs)
+        ]
+
+    return {"add": add, "remove": remove, "remove_dirs": remove_dirs}
+
+def apply_link_changes(changes, pool=None):
+    """
+    Apply a plan produced by plan_link_changes.
+    
+    Args:
+        changes (dict): The 'add', 'remove' and 'remove_dirs' plan.
+        pool (Executor, optional): I/O threads to apply the changes with.
+    """
+    def remove_dir(dir_path):
+        try:
+            shutil.rmtree(dir_path)
+            logging.debug("Removed directory: %s", dir_path)
+        except Exception as e:
+            logging.error(f"Failed to remove {dir_path}: {e}")
+
+    def remove_link(link_path):
+        try:
+            os.remove(link_path)
+            logging.debug("Removed link: %s", link_path)
+        except Exception as e:
+            logging.error(f"Failed to remove {link_path}: {e}")
+
+    # Each step finishes before the next starts, removals never race the new links
+    run = pool.map if pool is not None else map
+    list(run(remove_dir, changes['remove_dirs']))
+    list(run(remove_link, changes['remove']))
+    create_links(changes['add'], pool)
+
+def reconcile_new_releases_folder(folder_path, desired, dry_run=False, scope=None, pool=None):
+    """
+    Bring a spotlight folder in line with the desired links, touching only what differs.
+    
+    Args:
+        folder_path (str): Path to the spotlight folder.
+        desired (dict): Link path to the media file it should point at.
+        dry_run (bool): Only compute the changes, leave the folder untouched.
+        scope (list, optional): Limit removals to links pointing inside these media paths.
+        pool (Executor, optional): I/O threads to apply the changes with, for network mounts.
+    
+    Returns:
+        dict: The planned (or applied) changes.
+    """
+    if not os.path.exists(folder_path):
+        logging.warning(f"Folder {folder_path} does not exist. Skipping reconcile.")
+        return {"add": {}, "remove": [], "remove_dirs": []}
+
+    folder_path = os.path.normpath(folder_path)
+
+    # A link into its own spotlight folder would replace the media it points at with a loop
+    real_folder = os.path.join(os.path.realpath(folder_path), '')
+    real_dirs = {}  # Resolved once per media folder, episodes share their season's
+    looping = set()
+    for link_path, target in desired.items():
+        target_dir = os.path.dirname(target)
+        if target_dir not in real_dirs:
+            real_dirs[target_dir] = os.path.join(os.path.realpath(target_dir), '')
+        if real_dirs[target_dir].startswith(real_folder):
+            logging.error(f"Not linking {link_path} to {target}, it lies inside the spotlight folder")
+            looping.add(link_path)
+    if looping:
+        desired = {link_path: target for link_path, target in desired.items() if link_path not in looping}
+
+    changes = plan_link_changes(folder_path, desired, scope, pool)
+    logging.info(
+        f"Reconcile {folder_path}: {len(changes['add'])} to add, "
+        f"{len(changes['remove'])} links and {len(changes['remove_dirs'])} folders to remove"
+        f"{' (dry run)' if dry_run else ''}"
+    )
+    if not dry_run:
+        apply_link_changes(changes, pool)
+    return changes
+
+@contextmanager
+def file_lock(lock_path):
+    """
+    Hold an exclusive lock shared by every JellyFresh process and thread.
+    
+    Args:
+        lock_path (str): Path to the lock file, created if missing.
+    """
+    os.makedirs(os.path.dirname(lock_path) or '.', exist_ok=True)
+    with open(lock_path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def try_lock(lock_path):
+    """
+    Take an exclusive lock without waiting, for work only one process should do.
+
+    Args:
+        lock_path (str): Path to the lock file, created if missing.
+
+    Returns:
+        file: The open lock file, keep it open to hold the lock, or None if another process holds it.
+    """
+    os.makedirs(os.path.dirname(lock_path) or '.', exist_ok=True)
+    lock_file = open(lock_path, 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+NETWORK_FS_TYPES = ('cifs', 'smb3', 'smbfs', 'nfs', 'nfs4', 'fuse.sshfs', 'fuse.rclone', '9p')
+
+def get_mount_fstype(path, mounts_file='/proc/mounts'):
+    """
+    Find the filesystem type of the mount a path lives on.
+    
+    Args:
+        path (str): Any path on the filesystem.
+        mounts_file (str): Mount table to read.
+    
+    Returns:
+        str: The filesystem type (e.g., 'ext4', 'cifs', 'nfs4'), or None if unknown.
+    """
+    path = os.path.realpath(path)
+    best_mount, best_type = '', None
+    try:
+        with open(mounts_file, 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1].replace('\\040', ' ')
+                if (path == mount_point or path.startswith(os.path.join(mount_point, ''))) and len(mount_point) > len(best_mount):
+                    best_mount, best_type = mount_point, fields[2]
+    except OSError:
+        return None
+    return best_type
 
+def is_remote_path(path, io_mode='auto', mounts_file='/proc/mounts'):
+    """
+    Decide whether a path should be scanned in remote mode, overlapping its I/O round-trips.
+
+    Args:
+        path (str): A media path or spotlight folder.
+        io_mode (str): 'remote', 'local', or 'auto' to check whether the path is on a network mount.
+        mounts_file (str): Mount table to read.
+
+    Returns:
+        bool: True for remote mode.
+    """
+    if io_mode in ('remote', 'local'):
+        return io_mode == 'remote'
+    return get_mount_fstype(path, mounts_file) in NETWORK_FS_TYPES
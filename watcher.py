@@ -0,0 +1,348 @@
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+import threading
+from utils import get_mount_fstype, NETWORK_FS_TYPES
+
+# inotify(7) event flags
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct('iIII')
+
+# Defaults for the "watch" section of the configuration
+DEFAULT_WATCH_OPTIONS = {
+    "enabled": False,
+    "backend": "auto",            # auto, inotify or poll
+    "debounce_seconds": 15,       # Quiet time before changes are processed
+    "max_delay_seconds": 300,     # Process anyway after this long, even if events keep coming
+    "poll_interval": 300,         # Seconds between polls for the polling backend
+    "full_reconcile_hours": 24    # Periodic full scan to catch missed events, 0 to disable
+}
+
+
+class InotifyBackend:
+    """Recursive directory watch using Linux inotify, through libc."""
+
+    def __init__(self, roots):
+        self.overflowed = False
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._paths = {}  # watch descriptor -> directory
+        try:
+            for root in roots:
+                self._add_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise OSError(err, "inotify watch limit reached, raise fs.inotify.max_user_watches")
+            if err in (errno.ENOENT, errno.ENOTDIR):
+                return  # Removed before we got to it
+            raise OSError(err, f"{os.strerror(err)}: {path}")
+        self._paths[wd] = path
+
+    def _add_tree(self, root):
+        stack = [root]
+        while stack:
+            path = stack.pop()
+            self._add_watch(path)
+            try:
+                with os.scandir(path) as it:
+                    stack.extend(entry.path for entry in it if entry.is_dir(follow_symlinks=False))
+            except OSError:
+                continue
+
+    def wait(self, timeout):
+        """Wait up to timeout seconds and return the changed (path, is_dir) pairs."""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+
+        changed = []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+            offset += EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                self.overflowed = True
+                continue
+            if mask & IN_IGNORED:
+                self._paths.pop(wd, None)
+                continue
+            parent = self._paths.get(wd)
+            if parent is None or mask & IN_DELETE_SELF:
+                continue
+
+            path = os.path.join(parent, os.fsdecode(name)) if name else parent
+            is_dir = bool(mask & IN_ISDIR)
+            if is_dir and mask & (IN_CREATE | IN_MOVED_TO):
+                try:
+                    self._add_tree(path)
+                except OSError as e:
+                    logging.warning(f"Unable to watch {path}: {e}")
+            changed.append((path, is_dir))
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingBackend:
+    """
+    Directory mtime polling, for CIFS and NFS mounts where inotify sees nothing.
+
+    Each poll costs one stat per directory. Only directories whose mtime changed
+    are listed again, so a content-only rewrite of an existing file is left to the
+    periodic full reconcile.
+    """
+
+    def __init__(self, roots, interval):
+        self.overflowed = False
+        self.interval = interval
+        self._dirs = {}  # directory -> st_mtime_ns
+        for root in roots:
+            self._add_tree(root)
+        self._next_poll = time.monotonic() + interval
+
+    def _add_tree(self, root, changed=None):
+        stack = [root]
+        while stack:
+            path = stack.pop()
+            try:
+                self._dirs[path] = os.stat(path).st_mtime_ns
+                with os.scandir(path) as it:
+                    subdirs = [entry.path for entry in it if entry.is_dir(follow_symlinks=False)]
+            except OSError:
+                continue
+            if changed is not None and path != root:
+                changed.append((path, True))
+            stack.extend(subdirs)
+
+    def wait(self, timeout):
+        """Wait up to timeout seconds and return the changed (path, is_dir) pairs."""
+        now = time.monotonic()
+        if now < self._next_poll:
+            time.sleep(min(timeout, self._next_poll - now))
+            return []
+        self._next_poll = now + self.interval
+
+        changed = []
+        for path, mtime_ns in list(self._dirs.items()):
+            if path not in self._dirs:
+                continue  # Dropped with a removed parent
+            try:
+                st = os.stat(path)
+            except OSError:
+                prefix = os.path.join(path, '')
+                for known in [p for p in self._dirs if p == path or p.startswith(prefix)]:
+                    del self._dirs[known]
+                changed.append((path, True))
+                continue
+            if st.st_mtime_ns == mtime_ns:
+                continue
+
+            self._dirs[path] = st.st_mtime_ns
+            changed.append((path, True))
+            try:
+                with os.scandir(path) as it:
+                    new_dirs = [e.path for e in it if e.is_dir(follow_symlinks=False) and e.path not in self._dirs]
+            except OSError:
+                continue
+            for new_dir in new_dirs:
+                changed.append((new_dir, True))
+                self._add_tree(new_dir, changed)
+        return changed
+
+    def close(self):
+        self._dirs.clear()
+
+
+def resolve_unit(media_type, media_path, path, is_dir):
+    """
+    Map a changed path to the smallest part of a library that has to be rescanned.
+
+    Args:
+        media_type (str): 'movies' or 'shows'.
+        media_path (str): Root of the library the path belongs to.
+        path (str): The file or directory that changed.
+        is_dir (bool): Whether the path is (or was) a directory.
+
+    Returns:
+        tuple: (scope, scan_root, season_path) as expected by run_incremental_scan,
+            or None when the change doesn't map to a movie folder, show or season.
+    """
+    folder = path if is_dir else os.path.dirname(path)
+    if folder == media_path or not folder.startswith(os.path.join(media_path, '')):
+        return None  # Library root, left to the periodic full reconcile
+
+    if media_type == 'movies':
+        return (folder, folder if os.path.isdir(folder) else None, None)
+
+    # Shows: find the folder holding tvshow.nfo, then the season below it
+    current = folder
+    while current != media_path:
+        if os.path.exists(os.path.join(current, 'tvshow.nfo')):
+            if current == folder or os.path.basename(path) == 'tvshow.nfo':
+                return (current, current, None)
+            season_path = folder
+            while os.path.dirname(season_path) != current:
+                season_path = os.path.dirname(season_path)
+            return (season_path, current, season_path)
+        current = os.path.dirname(current)
+
+    # No tvshow.nfo: rescan the top folder if it's still there (the show may be known
+    # to the metadata backend), else it was deleted and its links go
+    top = folder
+    while os.path.dirname(top) != media_path:
+        top = os.path.dirname(top)
+    return (top, top if os.path.isdir(top) else None, None)
+
+
+def collapse_units(units):
+    """Drop units already covered by a broader unit, e.g., seasons of a deleted show."""
+    scopes = {scope for scope, _, _ in units}
+    return {
+        unit for unit in units
+        if not any(unit[0].startswith(os.path.join(scope, '')) for scope in scopes)
+    }
+
+
+class LibraryWatcher:
+    """
+    Watches the media paths of the configured libraries and rescans only what changed.
+
+    Events are debounced, so a season pack arriving file by file is processed once,
+    and a full reconcile runs periodically to catch anything the watch missed.
+    """
+
+    def __init__(self, load_libraries, on_changes, on_full_scan, options=None, load_version=None):
+        """
+        Args:
+            load_libraries (callable): Returns the library entries from the configuration.
+            on_changes (callable): Called with (libraries, units) to run an incremental scan.
+            on_full_scan (callable): Called to start a full scan.
+            options (dict, optional): The "watch" configuration section.
+            load_version (callable, optional): Returns the configuration's version. The
+                libraries are reloaded and the watch restarted whenever it changes.
+        """
+        self.load_libraries = load_libraries
+        self.load_version = load_version or (lambda: None)
+        self.on_changes = on_changes
+        self.on_full_scan = on_full_scan
+        self.options = dict(DEFAULT_WATCH_OPTIONS, **(options or {}))
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start watching in a background thread."""
+        self._thread = threading.Thread(target=self._run, name='library-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _open_backend(self, roots):
+        backend = self.options['backend']
+        if backend == 'auto':
+            network = [root for root in roots if get_mount_fstype(root) in NETWORK_FS_TYPES]
+            backend = 'poll' if network else 'inotify'
+        if backend == 'inotify':
+            try:
+                return InotifyBackend(roots)
+            except (OSError, AttributeError) as e:
+                logging.warning(f"inotify unavailable, falling back to polling: {e}")
+        return PollingBackend(roots, float(self.options['poll_interval']))
+
+    def _run(self):
+        debounce = float(self.options['debounce_seconds'])
+        max_delay = float(self.options['max_delay_seconds'])
+        full_interval = float(self.options['full_reconcile_hours']) * 3600
+
+        # Changes seen before a reload are processed against the reloaded libraries
+        pending = {}
+        first_event = last_event = None
+        next_full = time.monotonic() + full_interval if full_interval else None
+        while not self._stop.is_set():
+            version = self.load_version()
+            libraries = self.load_libraries()
+            groups = sorted({(lib['media_type'], lib['media_path']) for lib in libraries})
+            spotlight_folders = [os.path.join(lib['new_releases_folder'], '') for lib in libraries]
+            roots = sorted({media_path for _, media_path in groups if os.path.isdir(media_path)})
+            pending = {group: units for group, units in pending.items() if group in groups}
+            if not pending:
+                first_event = None
+            if not roots:
+                self._stop.wait(60)
+                continue
+
+            backend = self._open_backend(roots)
+            logging.info(f"Watching {len(roots)} media paths with {type(backend).__name__}")
+
+            try:
+                while not self._stop.is_set():
+                    if self.load_version() != version:
+                        logging.info("Configuration changed, reloading the watched libraries")
+                        break
+
+                    for path, is_dir in backend.wait(1.0):
+                        if any(path.startswith(folder) for folder in spotlight_folders):
+                            continue  # Our own links
+                        for media_type, media_path in groups:
+                            unit = resolve_unit(media_type, media_path, path, is_dir)
+                            if unit is not None:
+                                pending.setdefault((media_type, media_path), set()).add(unit)
+                                last_event = time.monotonic()
+                                first_event = first_event or last_event
+
+                    now = time.monotonic()
+                    if backend.overflowed:
+                        logging.warning("Watch event queue overflowed, running a full scan.")
+                        backend.overflowed = False
+                        pending.clear()
+                        first_event = None
+                        self.on_full_scan()
+                    elif pending and (now - last_event >= debounce or now - first_event >= max_delay):
+                        pending = {group: collapse_units(units) for group, units in pending.items()}
+                        logging.info(f"Processing {sum(len(u) for u in pending.values())} changed folders")
+                        try:
+                            self.on_changes(libraries, pending)
+                        except Exception as e:
+                            logging.error(f"Incremental scan failed: {e}")
+                        pending = {}
+                        first_event = None
+
+                    if next_full is not None and now >= next_full:
+                        self.on_full_scan()
+                        next_full = now + full_interval
+                        break  # Reload the libraries and restart the watch
+            finally:
+                backend.close()